@@ -0,0 +1,96 @@
+"""Benchmark citation extraction and linking on large generated articles.
+
+    python benchmarks/citation_parsing.py [--words 5000] [--sources 40] [--repeat 20]
+
+Compares the line-by-line extractor mainv2 used before citations.py (kept
+below as `legacy_extract`) with `citations.process`, which also links the
+in-text markers and validates the numbering.
+"""
+import argparse
+import random
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import citations  # noqa: E402
+
+WORDS = "market growth data analysis model adoption research study policy energy health network system".split()
+
+
+def make_article(words: int, sources: int, seed: int = 7) -> str:
+    """Markdown article of ~`words` words citing `sources` references, with a References section"""
+    rng = random.Random(seed)
+    paragraphs, written = [], 0
+    while written < words:
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20)))
+            written += sentence.count(" ") + 1
+            sentences.append(f"{sentence.capitalize()} [{rng.randint(1, sources)}].")
+        paragraphs.append(" ".join(sentences))
+    references = "\n".join(
+        f"[{n}] Source {n} | Author {n} | 2024-01-{n % 28 + 1:02d} | https://example.com/{n} | Web"
+        for n in range(1, sources + 1)
+    )
+    return "# Headline\n\n" + "\n\n".join(paragraphs) + "\n\n## References\n\n" + references + "\n"
+
+
+def legacy_extract(content: str):
+    """The pre-citations.py implementation (extraction only)"""
+    found = []
+    in_references = False
+    for line in content.splitlines():
+        line = line.strip()
+        if not in_references and "references" in line.lower():
+            in_references = True
+            continue
+        if in_references and line.startswith("["):
+            match = re.match(r"^\[\d+\]\s*(.*?)\s*\|\s*(.*?)\s*\|\s*(.*?)\s*\|\s*(.*?)$", line)
+            if match:
+                found.append({"number": len(found) + 1, "title": match.group(1), "url": match.group(4)})
+    return found
+
+
+def legacy_link(content: str, found):
+    """main.py's linker: a linear scan of the citations for every [n] marker"""
+    def replacer(match):
+        num = int(match.group(1))
+        for c in found:
+            if c["number"] == num and c.get("url"):
+                return f'<a href="{c["url"]}" target="_blank">[{num}]</a>'
+        return match.group(0)
+
+    return re.sub(r"\[(\d{1,3})\]", replacer, content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--sources", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    article = make_article(args.words, args.sources)
+    report = citations.process(article)
+    print(f"article: {len(article.split())} words, {len(report.citations)} references, "
+          f"{len(report.cited)} distinct numbers cited, issues: {report.issues or 'none'}")
+
+    # The same article with code in it takes the code-aware scan
+    with_code = article.replace("\n\n", "\n\nIndex it as `rows[1]`.\n\n```python\nrows[2] = rows[3]\n```\n\n", 1)
+    cases = {
+        "legacy extract": lambda: legacy_extract(article),
+        "legacy extract + link": lambda: legacy_link(article, legacy_extract(article)),
+        "citations.extract_citations": lambda: citations.extract_citations(article),
+        "citations.process (extract + link + validate)": lambda: citations.process(article),
+        "citations.process, article with code": lambda: citations.process(with_code),
+    }
+    for name, fn in cases.items():
+        best = min(timeit.repeat(fn, number=args.repeat, repeat=3)) / args.repeat
+        print(f"  {name:48s} {best * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Deterministic local stand-ins for OpenAI and Serper, used by the benchmarks.
+
+`install()` must run before mainv2's boot loads the ContentService: it
+points the model router's LLM factory and `service.serper_tool` at the
+fakes, so the crews are built with them and no request leaves the machine,
+while calls still pass through routing, retries, hedging and circuit
+breakers. `error_rate` and `slow_rate` inject failures and latency spikes.
+"""
+import random
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from crewai import BaseLLM
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from tools import StubSearchTool  # noqa: E402
+
+_TOPIC = re.compile(r"(?:Research the topic|about):\s*(.+)")
+_WORDS = re.compile(r"~(\d+) words")
+_FILLER = "analysis shows adoption growth across markets with measurable impact on cost and quality".split()
+
+
+def _text(messages: Union[str, List[Dict[str, str]]]) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(m.get("content", "")) for m in messages)
+
+
+class ServiceUnavailableError(Exception):
+    """Named like litellm's 503 error, so the LLM router retries and falls back on it"""
+
+
+class Faults:
+    """Random failures (`error_rate`) and latency spikes (`slow_rate` calls take `slow_latency` s)"""
+
+    def __init__(self, error_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 5.0, seed: Optional[int] = None):
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.errors = 0
+        self.spikes = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def inject(self, error: type):
+        """Sleep through a spike and/or raise `error`, as drawn"""
+        with self._lock:
+            spike = self._rng.random() < self.slow_rate
+            fail = self._rng.random() < self.error_rate
+            self.spikes += spike
+            self.errors += fail
+        if spike:
+            time.sleep(self.slow_latency)
+        if fail:
+            raise error("injected failure")
+
+
+class FakeLLM(BaseLLM):
+    """Answers crewai agents in the ReAct format after sleeping `latency` (± `jitter`) seconds.
+
+    The researcher first calls the search tool once, then returns a report
+    with a bibliography; the writer returns an article of the requested
+    length with in-text citations and a References section.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        jitter: float = 0.2,
+        sources: int = 5,
+        seed: Optional[int] = None,
+        faults: Optional[Faults] = None,
+    ):
+        super().__init__(model="fake-llm")
+        self.latency = latency
+        self.jitter = jitter
+        self.sources = sources
+        self.faults = faults or Faults()
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs) -> str:
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+        self.faults.inject(ServiceUnavailableError)
+        prompt = _text(messages)
+        match = _TOPIC.search(prompt)
+        topic = match.group(1).strip() if match else "the topic"
+        if "Research the topic" in prompt:
+            # crewai appends the tool call and its observation as an assistant message
+            searched = not isinstance(messages, str) and any(m.get("role") == "assistant" for m in messages)
+            if not searched:
+                return (
+                    "Thought: I should search the web first.\n"
+                    "Action: Search the internet with Serper\n"
+                    f'Action Input: {{"search_query": "{topic}"}}'
+                )
+            return "Thought: I now know the final answer\nFinal Answer: " + self.research(topic)
+        words = _WORDS.search(prompt)
+        return "Thought: I now know the final answer\nFinal Answer: " + self.article(
+            topic, int(words.group(1)) if words else 800
+        )
+
+    def research(self, topic: str) -> str:
+        findings = "\n".join(f"- Finding {n} about {topic} [{n}]" for n in range(1, self.sources + 1))
+        return f"## Key findings\n{findings}\n\n## Bibliography\n{self.bibliography(topic)}"
+
+    def article(self, topic: str, words: int) -> str:
+        paragraphs, written, n = [], 0, 0
+        while written < words:
+            n += 1
+            sentence = " ".join(_FILLER[(n + i) % len(_FILLER)] for i in range(12))
+            paragraphs.append(f"{sentence.capitalize()} about {topic} [{n % self.sources + 1}].")
+            written += 15
+        body = "\n\n".join(" ".join(paragraphs[i:i + 5]) for i in range(0, len(paragraphs), 5))
+        return f"# {topic.title()}\n\n{body}\n\n## References\n{self.bibliography(topic)}"
+
+    def bibliography(self, topic: str) -> str:
+        slug = re.sub(r"\W+", "-", topic.lower()).strip("-")
+        return "\n".join(
+            f"[{n}] {topic} report {n} | Analyst {n} | 2025-01-{n:02d} | https://example.com/{slug}/{n} | Web"
+            for n in range(1, self.sources + 1)
+        )
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return 16_000
+
+
+class FlakySearchTool(StubSearchTool):
+    """StubSearchTool that also fails (ConnectionError) and stalls as `faults` dictates"""
+
+    faults: Any = None
+
+    def _run(self, search_query: str, **kwargs) -> Dict[str, Any]:
+        result = super()._run(search_query, **kwargs)
+        if self.faults:
+            self.faults.inject(ConnectionError)
+        return result
+
+
+def install(
+    llm_latency: float = 0.5,
+    llm_jitter: float = 0.2,
+    search_latency: float = 0.2,
+    error_rate: float = 0.0,
+    slow_rate: float = 0.0,
+    slow_latency: float = 5.0,
+) -> Dict[str, Any]:
+    """Swap the generation service's models and search backend for fakes; returns them for inspection"""
+    import service
+    from cache import TTLCache
+    from resilience import is_transient_error
+    from tools import CachedSearchTool
+
+    llms: Dict[str, FakeLLM] = {}
+    faults = Faults(error_rate, slow_rate, slow_latency, seed=3)
+
+    def fake_llm(model: str, stream: bool = False) -> FakeLLM:
+        # Reached through ModelRouter.llm, which caches one client per (model, stream)
+        llms[f"{model}:{stream}"] = FakeLLM(llm_latency, llm_jitter, seed=len(llms), faults=faults)
+        return llms[f"{model}:{stream}"]
+
+    service.model_router.llm_factory = fake_llm
+    search = FlakySearchTool(latency=search_latency, faults=faults)
+    service.serper_tool = CachedSearchTool(
+        search, TTLCache(max_size=2048, ttl=3600), guard=service.guarded("search", is_transient_error)
+    )
+    return {"llms": llms, "search": search, "faults": faults}
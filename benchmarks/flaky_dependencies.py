@@ -0,0 +1,168 @@
+"""Exercise retries, hedging and circuit breaking against a flaky local HTTP server.
+
+    python benchmarks/flaky_dependencies.py [--calls 400] [--concurrency 16] [--latency 0.02]
+                                            [--error-rate 0.05] [--slow-rate 0.03] [--slow-latency 1]
+
+Starts a server on 127.0.0.1 that answers after `--latency` seconds, fails
+`--error-rate` of requests with 503 and stalls `--slow-rate` of them for
+`--slow-latency` seconds, then makes the same calls three ways:
+
+    bare      plain urllib calls
+    retry     resilience.Dependency with retries only
+    hedged    retries plus hedging after the observed p95
+
+and finally takes the server down to show the circuit opening and failing
+fast. Prints success rate and p50/p95/p99/max latency per mode. Needs no
+network and none of the app's dependencies.
+"""
+import argparse
+import logging
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from resilience import CircuitBreaker, CircuitOpenError, Dependency, RetryPolicy  # noqa: E402
+
+
+class FlakyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float, error_rate: float, slow_rate: float, slow_latency: float, seed: int = 5):
+        super().__init__(("127.0.0.1", 0), FlakyHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.down = False
+        # The next `fail_next` requests fail regardless of error_rate; failures answer `fail_status`
+        self.fail_next = 0
+        self.fail_status = 503
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/search"
+
+    def draw(self):
+        with self._lock:
+            self.requests += 1
+            slow, fail = self._rng.random() < self.slow_rate, self.down or self._rng.random() < self.error_rate
+            if self.fail_next:
+                self.fail_next -= 1
+                fail = True
+            return slow, fail
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        slow, fail = self.server.draw()
+        time.sleep(self.server.slow_latency if slow else self.server.latency)
+        body = b'{"error": "unavailable"}' if fail else b'{"organic": []}'
+        self.send_response(self.server.fail_status if fail else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def percentile(samples: List[float], p: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[p - 1]
+
+
+def drive(name: str, calls: int, concurrency: int, op: Callable[[], Any]) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            op()
+        except Exception as e:
+            with lock:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(calls)))
+    return {
+        "mode": name,
+        "ok": len(latencies),
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies, default=0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--hedge-budget", type=float, default=0.1)
+    args = parser.parse_args()
+    # Each retry logs a warning; only the summary matters here
+    logging.basicConfig(level=logging.ERROR)
+
+    server = FlakyServer(args.latency, args.error_rate, args.slow_rate, args.slow_latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def fetch():
+        with urllib.request.urlopen(server.url, timeout=args.slow_latency * 2) as response:
+            return response.read()
+
+    retry = RetryPolicy(attempts=3, base_delay=0.02, max_delay=0.2)
+    # Breakers that won't trip on the scattered failures of the first runs
+    retried = Dependency("bench-retry", retry=retry, breaker=CircuitBreaker("bench-retry", failures=50))
+    hedged = Dependency(
+        "bench-hedged", retry=retry, breaker=CircuitBreaker("bench-hedged", failures=50), hedge_budget=args.hedge_budget
+    )
+    results = [
+        drive("bare", args.calls, args.concurrency, fetch),
+        drive("retry", args.calls, args.concurrency, lambda: retried.call(fetch, hedge=False)),
+        drive("hedged", args.calls, args.concurrency, lambda: hedged.call(fetch)),
+    ]
+
+    # Outage: the circuit opens after `failures` consecutive errors and the rest fail fast
+    outage = Dependency("bench-outage", retry=retry, breaker=CircuitBreaker("bench-outage", failures=5, reset_after=60))
+    server.down = True
+    before = server.requests
+    results.append(drive("outage", args.calls, args.concurrency, lambda: outage.call(fetch, hedge=False)))
+    outage_requests = server.requests - before
+    server.shutdown()
+
+    print(f"{'mode':8s} {'ok':>5s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}  errors")
+    for r in results:
+        print(f"{r['mode']:8s} {r['ok']:5d} {r['p50'] * 1000:9.1f} {r['p95'] * 1000:9.1f} "
+              f"{r['p99'] * 1000:9.1f} {r['max'] * 1000:9.1f}  {r['errors'] or '-'}")
+    print(f"retried: {retried.retries} retries; hedged: {hedged.retries} retries, {hedged.hedges} hedges "
+          f"of {hedged.calls} calls")
+    print(f"outage: {outage_requests} requests reached the server for {args.calls} calls, "
+          f"circuit {outage.breaker.state} ({CircuitOpenError.__name__} for the rest)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measure how long `import mainv2` takes, i.e. the cold-start cost before /health can answer.
+
+    python benchmarks/import_time.py [--runs 5] [--max-seconds 1.0] [--top 15]
+
+Each run imports the app in a fresh interpreter (so nothing is cached in
+sys.modules) with placeholder API keys and the stub search backend. Exits
+non-zero when the median exceeds --max-seconds, so it can guard CI. The
+slowest modules come from `python -X importtime`. CONTENT_DB_PATH points at
+a throwaway file, so a run never creates or migrates the tracked content.db
+(importing the app should not open it at all; the store opens on first use).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+ENV = {
+    **os.environ,
+    "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "benchmark"),
+    "SEARCH_BACKEND": "stub",
+    "PYTHONDONTWRITEBYTECODE": "1",
+}
+
+
+def time_import(module: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, env=ENV, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def import_profile(module: str):
+    """(cumulative seconds, module) for every import, slowest first, from -X importtime"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=ENV, check=True, capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]) / 1e6, parts[2].rstrip()))
+    return sorted(rows, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="mainv2")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    scratch = tempfile.TemporaryDirectory(prefix="import-time-")
+    ENV["CONTENT_DB_PATH"] = str(Path(scratch.name) / "content.db")
+
+    # Baseline: the interpreter alone, so the report shows what the app adds
+    baseline = statistics.median(time_import("sys") for _ in range(args.runs))
+    samples = [time_import(args.module) for _ in range(args.runs)]
+    median = statistics.median(samples)
+    print(f"import {args.module}: median {median:.3f}s, min {min(samples):.3f}s, max {max(samples):.3f}s "
+          f"(interpreter start-up {baseline:.3f}s, {args.runs} runs)")
+
+    profile = import_profile(args.module)
+    print("\nslowest imports (cumulative):")
+    for seconds, name in profile[:args.top]:
+        print(f"  {seconds:8.3f}s  {name}")
+    # Lazy boot keeps these out of the import path entirely
+    heavy = sorted({name.strip().split(".")[0] for _, name in profile} & {"crewai", "crewai_tools", "litellm"})
+    print(f"\nheavy packages imported at start-up: {', '.join(heavy) or 'none'}")
+    touched = Path(ENV["CONTENT_DB_PATH"]).exists()
+    print(f"database opened at import: {'yes' if touched else 'no'}")
+    scratch.cleanup()
+
+    if args.max_seconds is not None and median > args.max_seconds:
+        print(f"FAIL: median import time {median:.3f}s exceeds {args.max_seconds:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Offline load test: drives the app and the DB layer with fake LLMs and search.
+
+    python benchmarks/load_test.py [--scenario all] [--requests 40] [--concurrency 8]
+                                   [--llm-latency 0.5] [--search-latency 0.2] [--seed-rows 2000]
+                                   [--error-rate 0.1] [--slow-rate 0.05] [--slow-latency 5]
+
+Runs mainv2 in-process through httpx's ASGI transport against a throwaway
+database (or `--database-url`, e.g. a scratch PostgreSQL), with
+`benchmarks/fakes.py` standing in for OpenAI and Serper, so no API keys or
+network are needed. Scenarios:
+
+    generate     POST /generate (new session each) and poll /jobs/{id} to completion
+    all-content  GET /all-content, walking pages by cursor
+    db           the content store: save_content, get_content_page, get_content, search
+    all          every scenario above, in that order
+
+Prints p50/p95/p99 latency, throughput and errors per scenario, the
+retry/hedge/circuit state per dependency and peak RSS; `--json PATH` also
+writes the numbers for comparing runs. `--error-rate` and `--slow-rate`
+make the fake LLMs and search fail or stall on that share of calls.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SCENARIOS = ("generate", "all-content", "db")
+
+
+def configure(args: argparse.Namespace, db_path: str):
+    """Environment for mainv2; must be set before it is imported"""
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.update({
+        "SEARCH_BACKEND": "stub",
+        "CONTENT_DB_PATH": db_path,
+        "DATABASE_URL": args.database_url or "",
+        "BOOT_MODE": "eager",
+        "GENERATION_WORKERS": str(args.workers),
+        "GENERATION_QUEUE_SIZE": str(max(args.requests, 20)),
+        # Unique topics anyway; keep every request on the full crew path
+        "RESULT_CACHE_TTL": "0",
+        "SIMILAR_REUSE_THRESHOLD": "2",
+        "RESEARCH_SEED_THRESHOLD": "2",
+        "RESEARCH_MAX_AGE": "0",
+        # Every request comes from the one ASGI client; measure the app, not admission control
+        "RATE_LIMIT_SESSION": "off",
+        "RATE_LIMIT_CLIENT": "off",
+        "RATE_LIMIT_GLOBAL": "off",
+    })
+
+
+async def seed(adb, rows: int):
+    """Insert `rows` synthetic articles in batches so listing and search have something to chew on"""
+    from fakes import FakeLLM
+
+    writer = FakeLLM(latency=0, jitter=0)
+    for start in range(0, rows, 500):
+        items = []
+        for n in range(start, min(start + 500, rows)):
+            topic = f"Benchmark topic {n} on {random.choice(['energy', 'health', 'finance', 'climate', 'ai'])}"
+            items.append({
+                "id": str(uuid.uuid4()),
+                "topic": topic,
+                "content": writer.article(topic, 600),
+                "citations": [],
+                "generated_at": datetime.now(),
+                "metadata": {"content_type": "blog_post", "word_count": 600},
+            })
+        await adb.save_many(f"seed-{start}", items)
+
+
+def percentile(samples: List[float], p: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[p - 1]
+
+
+async def drive(name: str, requests: int, concurrency: int, op: Callable[[int], Awaitable[None]]) -> Dict[str, Any]:
+    """Run `op(i)` for i in range(requests) with `concurrency` in flight; latency stats in seconds"""
+    latencies: List[float] = []
+    errors: List[str] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await op(i)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "scenario": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies, default=0.0),
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    import httpx
+    import fakes
+
+    fakes.install(args.llm_latency, args.llm_jitter, args.search_latency, args.error_rate, args.slow_rate, args.slow_latency)
+    import mainv2
+
+    await seed(mainv2.adb, args.seed_rows)
+    transport = httpx.ASGITransport(app=mainv2.app)
+    results = []
+
+    async with mainv2.lifespan(mainv2.app):
+        async def generate(i: int):
+            # A fresh client per request: one generation per session
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                response = await client.post("/generate", json={"topic": f"Load test topic {i} {uuid.uuid4().hex[:6]}"})
+                response.raise_for_status()
+                job_url = response.headers["Location"]
+                while True:
+                    job = (await client.get(job_url)).json()
+                    if job["status"] == "succeeded":
+                        return
+                    if job["status"] in ("failed", "cancelled"):
+                        raise RuntimeError(job["error"])
+                    await asyncio.sleep(args.poll_interval)
+
+        async def all_content(i: int):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                cursor = None
+                for _ in range(args.pages):
+                    params = {"limit": 20, **({"cursor": cursor} if cursor else {})}
+                    response = await client.get("/all-content", params=params)
+                    response.raise_for_status()
+                    cursor = response.json()["next_cursor"]
+                    if not cursor:
+                        break
+
+        async def db_ops(i: int):
+            adb = mainv2.adb
+            item = {
+                "id": str(uuid.uuid4()),
+                "topic": f"DB benchmark {i}",
+                "content": "benchmark body " * 400,
+                "citations": [],
+                "generated_at": datetime.now(),
+                "metadata": {"content_type": "blog_post", "word_count": 800},
+            }
+            await adb.save_content(f"db-bench-{i}", item)
+            page, _ = await adb.get_content_page(limit=20)
+            await adb.get_content(page[-1]["id"] if page else item["id"])
+            await adb.search("energy", limit=10)
+
+        operations = {"generate": generate, "all-content": all_content, "db": db_ops}
+        for name in SCENARIOS if args.scenario == "all" else (args.scenario,):
+            results.append(await drive(name, args.requests, args.concurrency, operations[name]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=4, help="GENERATION_WORKERS for the app")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--search-latency", type=float, default=0.2)
+    parser.add_argument("--seed-rows", type=int, default=2000)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake LLM/search calls that fail")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of fake LLM/search calls that stall")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="seconds a stalled call takes")
+    parser.add_argument("--database-url", help="benchmark against this store (rows are added to it) instead of a temp SQLite file")
+    parser.add_argument("--pages", type=int, default=5, help="pages walked per /all-content request")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(args, os.path.join(tmp, "bench.db"))
+        results = asyncio.run(run(args))
+    import resilience
+    dependencies = resilience.snapshot()
+
+    # ru_maxrss is KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{'scenario':12s} {'ok':>5s} {'err':>4s} {'req/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    for r in results:
+        print(f"{r['scenario']:12s} {r['ok']:5d} {r['errors']:4d} {r['throughput']:8.2f} "
+              f"{r['p50'] * 1000:9.1f} {r['p95'] * 1000:9.1f} {r['p99'] * 1000:9.1f} {r['max'] * 1000:9.1f}")
+        if r["first_error"]:
+            print(f"  first error: {r['first_error']}")
+    for name, stats in dependencies.items():
+        p95 = f"{stats['p95'] * 1000:.1f} ms" if stats["p95"] is not None else "-"
+        print(f"{name}: circuit {stats['circuit']}, {stats['calls']} calls, {stats['retries']} retried, {stats['hedges']} hedged, p95 {p95}")
+    print(f"peak RSS: {peak_rss_mb:.1f} MiB")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "args": vars(args), "peak_rss_mb": peak_rss_mb, "results": results, "dependencies": dependencies,
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
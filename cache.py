@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from cancellation import Cancelled
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = re.compile(r"^[\W_]+|[\W_]+$")
+
+
+def normalize_topic(topic: str) -> str:
+    """Case- and whitespace-folded topic, ignoring leading/trailing punctuation"""
+    folded = _WHITESPACE.sub(" ", topic.casefold()).strip()
+    return _EDGE_PUNCTUATION.sub("", folded)
+
+
+def bucket_word_count(word_count: Optional[int], step: int = 100) -> int:
+    """Round a requested length to the nearest `step` words (never below one step)"""
+    return max(step, int(round((word_count or 0) / step)) * step)
+
+
+def request_key(topic: str, content_type: Optional[str], word_count: Optional[int]) -> str:
+    """Content address of a generation request"""
+    parts = [normalize_topic(topic), normalize_topic(content_type or ""), str(bucket_word_count(word_count))]
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+class ResultCache:
+    """Persistent cache of finished generations with single-flight coalescing.
+
+    Entries live in the `generation_cache` table of content.db, expire after
+    `ttl` seconds and are evicted least-recently-used once the table holds
+    more than `max_entries` rows or `max_bytes` of payload. Concurrent calls
+    for the same key while a generation is running all await that one run;
+    if that run is cancelled for its own caller, a waiter takes it over.
+    """
+
+    def __init__(self, adb, ttl: float = 86400, max_entries: int = 1000, max_bytes: int = 50_000_000):
+        self.adb = adb
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    async def get_or_create(
+        self, key: str, factory: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], str]:
+        """Return `(result, source)` where source is "hit", "coalesced" or "miss"."""
+        if not self.enabled:
+            return await factory(), "miss"
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight), "coalesced"
+            except Cancelled:
+                # The caller running it gave up, this one hasn't: run it again (or join whoever already does)
+                return await self.get_or_create(key, factory)
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting on a failed run; don't let asyncio warn about it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            cached = await self.adb.get_cached_result(key, self.ttl)
+            if cached is not None:
+                self.hits += 1
+                source = "hit"
+                result = cached
+            else:
+                self.misses += 1
+                source = "miss"
+                result = await factory()
+                await self.adb.put_cached_result(key, result, self.max_entries, self.max_bytes)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, source
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+
+class TTLCache:
+    """Thread-safe in-memory LRU cache whose entries also expire after `ttl` seconds.
+
+    With `max_bytes`, `set` takes each entry's size and the least recently
+    used entries are also evicted to keep the total under that budget.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600, max_bytes: Optional[int] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._bytes -= self._data.pop(key)[2]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, size: int = 0):
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[2]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value, size)
+            self._bytes += size
+            while len(self._data) > self.max_size or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._bytes -= self._data.popitem(last=False)[1][2]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        stats = {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+        if self.max_bytes is not None:
+            stats["bytes"] = self._bytes
+        return stats
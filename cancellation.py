@@ -0,0 +1,74 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+# Why a generation stopped early, as reported to clients
+REASONS = {
+    "deadline": "Generation timed out",
+    "abandoned": "Job abandoned: its status was not polled",
+    "disconnected": "Client disconnected",
+    "cancelled": "Cancelled by the client",
+}
+
+
+class Cancelled(Exception):
+    """Raised at a checkpoint once the generation's CancelToken has fired"""
+
+    def __init__(self, reason: str):
+        super().__init__(REASONS.get(reason, reason))
+        self.reason = reason
+
+
+class CancelToken:
+    """Deadline and cancellation state of one generation, shared by its task and crew thread.
+
+    Work stops cooperatively: the crew thread calls `checkpoint()` between
+    LLM calls and tool calls and gets `Cancelled` once the token has been
+    cancelled, its deadline has passed, or (with `idle_timeout`) nobody has
+    called `touch()` for that long. An LLM or search call already running
+    is not interrupted.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, idle_timeout: Optional[float] = None):
+        now = time.monotonic()
+        self.deadline = now + timeout if timeout else None
+        self.idle_timeout = idle_timeout or None
+        self.last_seen = now
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled"):
+        # The first reason sticks; assignment is atomic, so any thread may call this
+        if self.reason is None:
+            self.reason = reason
+
+    def touch(self):
+        """Record that someone still wants the result (a status poll)"""
+        self.last_seen = time.monotonic()
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def poll(self) -> Optional[str]:
+        """The reason to stop, or None to carry on"""
+        if self.reason is None:
+            now = time.monotonic()
+            if self.deadline is not None and now >= self.deadline:
+                self.cancel("deadline")
+            elif self.idle_timeout and now - self.last_seen >= self.idle_timeout:
+                self.cancel("abandoned")
+        return self.reason
+
+    def check(self):
+        if self.poll():
+            raise Cancelled(self.reason)
+
+
+# The token of the generation this task or crew thread works for; copied into threads with the context
+current_cancel: ContextVar[Optional[CancelToken]] = ContextVar("current_cancel", default=None)
+
+
+def checkpoint():
+    """Raise Cancelled if the current generation should stop; a no-op outside one"""
+    token = current_cancel.get()
+    if token is not None:
+        token.check()
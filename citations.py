@@ -0,0 +1,181 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# A line holding only the heading: "References", "## Sources", "**Bibliography:**", "5. Works Cited"
+REFERENCES_HEADING = re.compile(
+    r"^[ \t]*(?:#{1,6}[ \t]*|\d+\.[ \t]*)?\**[ \t]*(?:bibliography|references|sources|works cited)"
+    r"[ \t]*:?[ \t]*\**[ \t]*:?[ \t]*$",
+    re.IGNORECASE,
+)
+# "[3] Title | Author | Date | URL | Web", optionally as a list item
+REFERENCE_ENTRY = re.compile(r"^\s*(?:[-*]\s*)?\[(\d+)\]\s*(\S(?:.*\S)?)\s*$")
+URL = re.compile(r"https?://[^\s|<>\]\)]+")
+# In-text markers: [2], [2, 5], [2-4], numbered from 1; markers that are already links ("[[2]](url)") are skipped
+_MARKER = re.compile(r"\[(?<!\[\[)(?P<numbers>[1-9]\d{0,2}(?:\s*[,–-]\s*[1-9]\d{0,2})*)\](?!\]?\()")
+# Code, where "a[1]" is never a citation: ``` fenced blocks and `inline` spans, plus ~~~ fenced blocks.
+# Each branch set starts with one literal character, which keeps the regex engine's fast scan for it;
+# a body with both kinds of fence takes the (several times slower) combined pattern
+_CODE_TICKS = r"```.*?(?:```|\Z)|`[^`\n]+`"
+_CODE_TILDES = r"~~~.*?(?:~~~|\Z)"
+_CODE = {
+    (True, False): re.compile(_CODE_TICKS, re.DOTALL),
+    (False, True): re.compile(_CODE_TILDES, re.DOTALL),
+    (True, True): re.compile(f"{_CODE_TICKS}|{_CODE_TILDES}", re.DOTALL),
+}
+_MARKER_PART = re.compile(r"(\d+)(?:\s*[–-]\s*(\d+))?")
+_MAX_RANGE = 50
+
+
+@dataclass
+class CitationReport:
+    """Result of `process`: the (linked) article, its parsed references and consistency checks"""
+    content: str
+    citations: List[Dict[str, Any]]
+    cited: List[int] = field(default_factory=list)
+    dangling: List[int] = field(default_factory=list)  # cited in the text, missing from the references
+    unused: List[int] = field(default_factory=list)  # listed in the references, never cited
+    duplicates: List[int] = field(default_factory=list)  # numbers listed more than once
+
+    @property
+    def issues(self) -> Dict[str, List[int]]:
+        found = {"dangling": self.dangling, "unused": self.unused, "duplicates": self.duplicates}
+        return {name: numbers for name, numbers in found.items() if numbers}
+
+
+def split_references(content: str) -> Optional[int]:
+    """Offset of the last References heading, or None; the article body is everything before it"""
+    return _scan_references(content)[0]
+
+
+def parse_entry(number: int, text: str) -> Dict[str, Any]:
+    """One reference line (without its [n]) as a citation dict; tolerates missing fields"""
+    parts = [part.strip() for part in text.split("|")]
+    if len(parts) >= 4:
+        title, author, date, url = parts[:4]
+        kind = parts[4] if len(parts) > 4 and parts[4] else "Web"
+    else:
+        match = URL.search(text)
+        url = match.group(0).rstrip(".,;") if match else ""
+        title = parts[0].replace(match.group(0), "").strip(" -–:,.") if match else parts[0]
+        author, date, kind = "", "", "Web"
+    return {"number": number, "title": title, "author": author, "date": date, "url": url, "type": kind}
+
+
+def extract_citations(content: str) -> List[Dict[str, Any]]:
+    """Citations listed under the article's References heading, in order of appearance"""
+    return list(_scan_references(content)[1].values())
+
+
+def link_citations(content: str, citations: List[Dict[str, Any]]) -> str:
+    """Turn in-text [n] markers of the article body into Markdown links to the cited URL"""
+    start = _scan_references(content)[0]
+    body, tail = (content, "") if start is None else (content[:start], content[start:])
+    urls = {c["number"]: c["url"] for c in citations if c.get("url")}
+    return _link_markers(body, urls, []) + tail
+
+
+def process(content: str, link: bool = True) -> CitationReport:
+    """Parse references, link in-text markers and validate numbering in one pass over the text.
+
+    The References section is read once, bottom-up, until its heading; the
+    body before it is scanned once for markers.
+    """
+    start, by_number, duplicates = _scan_references(content)
+    body, tail = (content, "") if start is None else (content[:start], content[start:])
+
+    urls = {number: c["url"] for number, c in by_number.items() if c["url"]} if link else None
+    cited: List[int] = []
+    body = _link_markers(body, urls, cited)
+
+    cited = list(dict.fromkeys(cited))
+    cited_set = set(cited)
+    return CitationReport(
+        content=body + tail,
+        citations=list(by_number.values()),
+        cited=cited,
+        dangling=[n for n in cited if n not in by_number],
+        unused=[n for n in by_number if n not in cited_set],
+        duplicates=duplicates,
+    )
+
+
+def _scan_references(content: str) -> Tuple[Optional[int], Dict[int, Dict[str, Any]], List[int]]:
+    """(heading offset, {number: citation}, duplicate numbers), reading lines up from the end to the last heading"""
+    entries: List[Tuple[str, str]] = []
+    end = len(content)
+    while end >= 0:
+        newline = content.rfind("\n", 0, end)
+        line = content[newline + 1:end]
+        match = REFERENCE_ENTRY.match(line)
+        if match:  # an entry line can't be a heading, so most lines take one match
+            entries.append(match.groups())
+        elif REFERENCES_HEADING.match(line):
+            break
+        end = newline
+    else:
+        return None, {}, []
+
+    by_number: Dict[int, Dict[str, Any]] = {}
+    duplicates: List[int] = []
+    for number, text in reversed(entries):
+        number = int(number)
+        if number in by_number:
+            duplicates.append(number)
+        else:
+            by_number[number] = parse_entry(number, text)
+    return newline + 1, by_number, duplicates
+
+
+def _link_markers(body: str, urls: Optional[Dict[int, str]], cited: List[int]) -> str:
+    """Add the numbers the body's markers cite to `cited`; link the markers to `urls` unless it is None"""
+    links: Dict[str, str] = {}
+    code_pattern = _CODE.get(("`" in body, "~~~" in body))
+    if code_pattern:
+        # Code passes through untouched; only the text between code spans is scanned
+        pieces, start = [], 0
+        for code in code_pattern.finditer(body):
+            pieces.append(_link_text(body[start:code.start()], urls, links))
+            pieces.append(code.group(0))
+            start = code.end()
+        pieces.append(_link_text(body[start:], urls, links))
+        linked = "".join(pieces)
+    else:
+        linked = _link_text(body, urls, links)
+    for marker in links:
+        cited.extend(_numbers(marker))
+    return body if urls is None else linked
+
+
+def _link_text(text: str, urls: Optional[Dict[int, str]], links: Dict[str, str]) -> str:
+    """`text` with its markers linked; each distinct marker is parsed once and remembered in `links`"""
+    parts = _MARKER.split(text)  # text, marker numbers, text, ...
+    for i in range(1, len(parts), 2):
+        marker = parts[i]
+        link = links.get(marker)
+        if link is None:
+            link = links[marker] = _link(marker, urls) if urls is not None else marker
+        parts[i] = link
+    return "".join(parts)
+
+
+def _numbers(marker: str) -> List[int]:
+    if marker.isdigit():  # the common case, "[n]"
+        return [int(marker)]
+    numbers = []
+    for part in _MARKER_PART.finditer(marker):
+        first = int(part.group(1))
+        last = int(part.group(2) or first)
+        # "[2-4]" expands; a reversed or absurd range counts as its endpoints only
+        numbers.extend(range(first, last + 1) if 0 <= last - first <= _MAX_RANGE else (first, last))
+    return numbers
+
+
+def _link(marker: str, urls: Dict[int, str]) -> str:
+    numbers = _numbers(marker)
+    if not any(n in urls for n in numbers):
+        return f"[{marker}]"
+    if len(numbers) == 1:
+        return f"[[{marker}]]({urls[numbers[0]]})"
+    # Lists and ranges link each number separately: [[2]](u2)[[3]](u3)
+    return "".join(f"[[{n}]]({urls[n]})" if n in urls else f"[{n}]" for n in numbers)
@@ -0,0 +1,180 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Set
+
+from research import split_report
+
+try:
+    import tiktoken  # installed with litellm
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # missing package or no cached encoding file offline
+    _ENCODING = None
+
+_REF = re.compile(r"\[(\d+)\]")
+_WORD = re.compile(r"\w+", re.UNICODE)
+_DIGIT = re.compile(r"\d")
+_HEADING = re.compile(r"^\s*#{1,6}\s")
+# Findings with the same numbers sharing this share of their other words are the same fact told twice
+DUPLICATE_OVERLAP = 0.8
+
+
+def count_tokens(text: str) -> int:
+    """Prompt tokens of `text` (cl100k_base), or roughly a token per 4 characters without tiktoken"""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def token_budget(word_count: int, tokens_per_word: float, minimum: int, maximum: int) -> int:
+    """Research tokens the writer gets for an article of `word_count` words"""
+    return max(minimum, min(maximum, int(word_count * tokens_per_word)))
+
+
+@dataclass
+class Compaction:
+    research: str
+    tokens_before: int
+    tokens_after: int
+    findings_kept: int
+    findings_dropped: int
+    duplicates: int
+    sources_kept: int
+    sources_dropped: int
+
+
+@dataclass
+class _Finding:
+    index: int
+    heading: str
+    text: str
+    words: Set[str]  # without the numbers, which must match exactly
+    numbers: Set[str]
+    refs: List[int]
+    tokens: int
+
+    @property
+    def score(self) -> float:
+        # Sourced statistics first, then sourced claims; earlier findings win ties
+        return 1.0 + min(len(self.refs), 3) * 0.5 + (0.5 if _DIGIT.search(_REF.sub("", self.text)) else 0.0)
+
+
+def _findings(body: str) -> List[_Finding]:
+    """Bullets and paragraphs of the findings text, each remembering the heading it sat under"""
+    findings: List[_Finding] = []
+    heading, block = "", []
+
+    def flush():
+        text = "\n".join(block).strip()
+        block.clear()
+        if text:
+            words = set(_WORD.findall(_REF.sub("", text).casefold()))
+            numbers = {word for word in words if _DIGIT.search(word)}
+            findings.append(_Finding(
+                index=len(findings),
+                heading=heading,
+                text=text,
+                words=words - numbers,
+                numbers=numbers,
+                refs=[int(n) for n in _REF.findall(text)],
+                tokens=count_tokens(text),
+            ))
+
+    for line in body.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            flush()
+        elif _HEADING.match(line) or (stripped.endswith(":") and len(stripped) < 80 and not block):
+            flush()
+            heading = stripped
+        elif stripped[0] in "-*•" or stripped[:2].rstrip(".)").isdigit():
+            # A list item starts a new finding; wrapped lines continue it
+            flush()
+            block.append(stripped)
+        else:
+            block.append(stripped)
+    flush()
+    return findings
+
+
+def _is_duplicate(finding: _Finding, kept: List[_Finding]) -> bool:
+    # "12% in 2021" and "18% in 2023" share nearly every word but are different facts
+    for other in kept:
+        if finding.numbers != other.numbers:
+            continue
+        smaller = min(len(finding.words), len(other.words))
+        if finding.words == other.words or (smaller and len(finding.words & other.words) / smaller >= DUPLICATE_OVERLAP):
+            return True
+    return False
+
+
+def _truncate(text: str, tokens: int) -> str:
+    words = text.split()
+    keep = max(1, tokens * 3 // 4)
+    return text if len(words) <= keep else " ".join(words[:keep]) + " …"
+
+
+def compact_research(research: str, budget: int) -> Compaction:
+    """Fit a research report into `budget` tokens for the writer.
+
+    Reports already within budget pass through untouched. Otherwise
+    near-duplicate findings are dropped, the rest ranked (cited statistics,
+    then cited claims, then the rest, earlier first) and kept while they and
+    their sources fit; kept findings stay in report order under their
+    headings, and the bibliography keeps only the sources they cite, with
+    their original numbers.
+    """
+    tokens_before = count_tokens(research)
+    body, entries = split_report(research)
+    findings = _findings(body)
+    if tokens_before <= budget or not findings:
+        return Compaction(research, tokens_before, tokens_before, len(findings), 0, 0, len(entries), 0)
+
+    unique: List[_Finding] = []
+    for finding in findings:
+        if not _is_duplicate(finding, unique):
+            unique.append(finding)
+
+    entry_tokens = {n: count_tokens(f"[{n}] {entry}\n") for n, entry in entries.items()}
+    kept: List[_Finding] = []
+    sources: Dict[int, str] = {}
+    headings: Set[str] = set()
+    used = count_tokens("## Bibliography\n\n")
+    for finding in sorted(unique, key=lambda f: (-f.score, f.index)):
+        new_sources = {n for n in finding.refs if n in entries and n not in sources}
+        cost = finding.tokens + sum(entry_tokens[n] for n in new_sources)
+        if finding.heading and finding.heading not in headings:
+            cost += count_tokens(finding.heading)
+        if used + cost > budget:
+            continue
+        kept.append(finding)
+        headings.add(finding.heading)
+        sources.update((n, entries[n]) for n in new_sources)
+        used += cost
+    if not kept:
+        # Even the best finding is over budget on its own: keep its start
+        best = min(unique, key=lambda f: (-f.score, f.index))
+        best.text = _truncate(best.text, budget)
+        kept = [best]
+
+    lines: List[str] = []
+    heading = None
+    for finding in sorted(kept, key=lambda f: f.index):
+        if finding.heading and finding.heading != heading:
+            lines.extend(["", finding.heading])
+            heading = finding.heading
+        lines.append(finding.text)
+    if sources:
+        lines.extend(["", "## Bibliography", ""])
+        lines.extend(f"[{n}] {entry}" for n, entry in sorted(sources.items()))
+    compacted = "\n".join(lines).strip()
+
+    return Compaction(
+        research=compacted,
+        tokens_before=tokens_before,
+        tokens_after=count_tokens(compacted),
+        findings_kept=len(kept),
+        findings_dropped=len(findings) - len(kept),
+        duplicates=len(findings) - len(unique),
+        sources_kept=len(sources),
+        sources_dropped=len(entries) - len(sources),
+    )
@@ -1,21 +1,126 @@
 import sqlite3
+import html
 import json
+import sys
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
-from datetime import datetime
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timezone
+
+from cache import TTLCache
+from metrics import DB_QUERY_SECONDS
+from storage import EXCERPT_CHARS, decode_cursor, encode_cursor, make_excerpt, search_tokens
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
+# Applied to every pooled connection. WAL lets readers run alongside the single
+# writer; NORMAL sync is durable across app crashes and only loses the last
+# transactions on power loss, which is fine for regenerable content.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",   # 16 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # 256 MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+INSERT_CONTENT_SQL = """
+    INSERT INTO content
+    (id, session_id, topic, content, citations, generated_at, metadata, encoding, excerpt)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# Same, keeping the original created_at of rows copied from another store
+IMPORT_CONTENT_SQL = """
+    INSERT INTO content
+    (id, session_id, topic, content, citations, generated_at, metadata, encoding, excerpt, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# `content.encoding` says how the content and citations columns are stored:
+# "raw" (plain TEXT, every row written before compression existed), "zlib" or "zstd".
+ENCODINGS = ("raw", "zlib", "zstd")
+
+# Contentless FTS5 tables accept DELETE only from SQLite 3.43 on
+FTS_CONTENTLESS_DELETE = sqlite3.sqlite_version_info >= (3, 43, 0)
+# Words around the best match in a search result's snippet
+SNIPPET_WORDS = 24
+
 
 class ContentDB:
-    def __init__(self, db_path: str = "content.db"):
+    def __init__(
+        self,
+        db_path: str = "content.db",
+        known_sessions: int = 100_000,
+        compression: str = "zlib",
+        compress_min_bytes: int = 1024,
+    ):
         self.db_path = db_path
-        self.init_db()
+        if compression not in ENCODINGS:
+            raise ValueError(f"Unknown compression {compression!r}, expected one of {ENCODINGS}")
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, compressing content with zlib")
+            compression = "zlib"
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        # Sessions that have generated content; a session never loses that status
+        self.known_sessions = TTLCache(max_size=known_sessions, ttl=float("inf"))
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        # The schema is created or migrated by the first connect(), not here: constructing
+        # the store at import must not touch the file (see init_db)
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        """Return this thread's persistent connection, opening it on first use.
+
+        Connections live for the lifetime of the thread and keep a cache of
+        prepared statements, so repeated queries skip parsing and planning.
+        Use `with db.connect() as conn:` for a transaction; it does not close.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread is off only so close() can run from the shutdown thread
+            conn = sqlite3.connect(self.db_path, timeout=5.0, cached_statements=256, check_same_thread=False)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self.init_db(conn)
+                    self._schema_ready = True
+        return conn
+
+    def close(self):
+        """Close every pooled connection (call once at shutdown)"""
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception as e:
+                    logger.warning(f"Closing DB connection failed: {e}")
+            self._connections.clear()
+        self._local = threading.local()
 
-    def init_db(self):
-        """Initialize database with content table"""
+    def init_db(self, conn: sqlite3.Connection):
+        """Initialize database with content table (DDL only; run once by the first connect())"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with conn:
+                # Journal mode is persistent, so setting it once here is enough
+                conn.execute("PRAGMA journal_mode = WAL")
                 conn.execute("""
                     CREATE TABLE IF NOT EXISTS content (
                         id TEXT PRIMARY KEY,
@@ -25,89 +130,710 @@ class ContentDB:
                         citations TEXT NOT NULL,
                         generated_at TEXT NOT NULL,
                         metadata TEXT NOT NULL,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        encoding TEXT NOT NULL DEFAULT 'raw',
+                        excerpt TEXT
                     )
                 """)
+                # Tables created before compression existed get the new columns
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(content)")}
+                if "encoding" not in columns:
+                    conn.execute("ALTER TABLE content ADD COLUMN encoding TEXT NOT NULL DEFAULT 'raw'")
+                if "excerpt" not in columns:
+                    conn.execute("ALTER TABLE content ADD COLUMN excerpt TEXT")
                 conn.execute("CREATE INDEX IF NOT EXISTS idx_session ON content(session_id)")
+                # Listing walks this index newest-first, so a page costs O(limit)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_created ON content(created_at, id)")
+                # Row count maintained by triggers so /all-content never scans the table
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS content_stats (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        total INTEGER NOT NULL
+                    )
+                """)
+                conn.execute("""
+                    INSERT OR IGNORE INTO content_stats (id, total)
+                    SELECT 1, COUNT(*) FROM content
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS content_count_insert AFTER INSERT ON content
+                    BEGIN UPDATE content_stats SET total = total + 1 WHERE id = 1; END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS content_count_delete AFTER DELETE ON content
+                    BEGIN UPDATE content_stats SET total = total - 1 WHERE id = 1; END
+                """)
+                # Finished generations keyed by normalized request, see cache.ResultCache
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS generation_cache (
+                        key TEXT PRIMARY KEY,
+                        payload TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_hit_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_hit ON generation_cache(last_hit_at)")
+                # Research reports by normalized topic, reused by writing-only runs
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS research (
+                        topic_key TEXT PRIMARY KEY,
+                        topic TEXT NOT NULL,
+                        report TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                # Full-text index, written alongside every insert (see _index_content).
+                # Contentless and keyed by content.rowid: it holds only postings, not a
+                # second plaintext copy of every (compressed) body; search() cuts
+                # snippets from the decoded body instead.
+                fts = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'content_fts'").fetchone()
+                if fts and "content=''" not in fts[0].replace(" ", ""):
+                    # The old content-storing index; refilled by ensure_search_index()
+                    conn.execute("DROP TRIGGER IF EXISTS content_fts_delete")
+                    conn.execute("DROP TABLE content_fts")
+                    logger.info("Dropped the content-storing search index, rebuilding it contentless")
+                conn.execute(f"""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5(
+                        topic, content, content = '',
+                        {"contentless_delete = 1," if FTS_CONTENTLESS_DELETE else ""} tokenize = 'porter unicode61'
+                    )
+                """)
+                fts = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'content_fts'").fetchone()
+                if "contentless_delete" in fts[0]:
+                    conn.execute("""
+                        CREATE TRIGGER IF NOT EXISTS content_fts_delete AFTER DELETE ON content
+                        BEGIN DELETE FROM content_fts WHERE rowid = old.rowid; END
+                    """)
+                # Otherwise deleted rows keep their postings until `python db.py reindex`;
+                # search() joins on content, so they are never returned
                 conn.commit()
                 logger.info("Database initialized successfully.")
         except Exception as e:
             logger.error(f"DB init failed: {e}")
 
+    def ensure_search_index(self) -> int:
+        """Fill the full-text index if the content predates it (or its layout); returns rows indexed.
+
+        Can take seconds on a large table, so the app runs it in the
+        background after start-up rather than in init_db.
+        """
+        try:
+            if not self.count_content() or self._search_index_size():
+                return 0
+            return self.reindex_search()
+        except Exception as e:
+            logger.error(f"Search index backfill failed: {e}")
+            return 0
+
     def save_content(self, session_id: str, content_data: Dict[str, Any]):
         """Save generated content for a session"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT INTO content 
-                    (id, session_id, topic, content, citations, generated_at, metadata)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    content_data["id"],
-                    session_id,
-                    content_data["topic"],
-                    content_data["content"],
-                    json.dumps(content_data["citations"]),
-                    content_data["generated_at"].isoformat(),
-                    json.dumps(content_data["metadata"])
-                ))
+            with self.connect() as conn:
+                conn.execute(INSERT_CONTENT_SQL, self._content_params(session_id, content_data))
+                _index_content(conn, [content_data])
                 conn.commit()
+                self.known_sessions.set(session_id, True)
                 logger.info(f"Content saved: {content_data['id']}")
         except Exception as e:
             logger.error(f"Save content failed: {e}")
 
+    def save_many(self, session_id: str, items: List[Dict[str, Any]]) -> int:
+        """Save several generated items for a session in one transaction; returns rows saved"""
+        if not items:
+            return 0
+        try:
+            with self.connect() as conn:
+                conn.executemany(INSERT_CONTENT_SQL, [self._content_params(session_id, item) for item in items])
+                _index_content(conn, items)
+            self.known_sessions.set(session_id, True)
+            logger.info(f"Content saved: {len(items)} items for session {session_id}")
+            return len(items)
+        except Exception as e:
+            logger.error(f"Save batch failed: {e}")
+            return 0
+
+    def session_has_content(self, session_id: str) -> bool:
+        """True if the session has generated anything (index-only lookup, cached once true)"""
+        if self.known_sessions.get(session_id):
+            return True
+        try:
+            with self.connect() as conn:
+                row = conn.execute(
+                    "SELECT 1 FROM content WHERE session_id = ? LIMIT 1", (session_id,)
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"Session lookup failed: {e}")
+            return False
+        if row:
+            self.known_sessions.set(session_id, True)
+        return row is not None
+
+    def get_content(self, content_id: str) -> Optional[Dict[str, Any]]:
+        """Get one content item by id (primary-key lookup)"""
+        try:
+            with self.connect() as conn:
+                row = conn.execute("""
+                    SELECT id, topic, content, citations, generated_at, metadata, encoding
+                    FROM content
+                    WHERE id = ?
+                """, (content_id,)).fetchone()
+        except Exception as e:
+            logger.error(f"Fetch content failed: {e}")
+            return None
+        parsed = self._parse_rows([row]) if row else []
+        return parsed[0] if parsed else None
+
+    def get_topic_index(self, limit: int = 50_000) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """(id, topic, metadata) of the newest `limit` items, oldest first, for the similarity index"""
+        try:
+            with self.connect() as conn:
+                rows = conn.execute("""
+                    SELECT id, topic, metadata FROM (
+                        SELECT id, topic, metadata, created_at FROM content
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT ?
+                    ) ORDER BY created_at, id
+                """, (limit,)).fetchall()
+        except Exception as e:
+            logger.error(f"Fetch topic index failed: {e}")
+            return []
+        results = []
+        for row in rows:
+            try:
+                results.append((row[0], row[1], json.loads(row[2])))
+            except Exception as e_inner:
+                logger.warning(f"Skipping row due to parse error: {e_inner}, row={row}")
+        return results
+
     def get_session_content(self, session_id: str) -> List[Dict[str, Any]]:
         """Get all content for a specific session"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.execute("""
-                    SELECT id, topic, content, citations, generated_at, metadata
+                    SELECT id, topic, content, citations, generated_at, metadata, encoding
                     FROM content
                     WHERE session_id = ?
                     ORDER BY created_at DESC
                 """, (session_id,))
-                results = []
-                for row in cursor.fetchall():
-                    try:
-                        results.append({
-                            "id": row[0],
-                            "topic": row[1],
-                            "content": row[2],
-                            "citations": json.loads(row[3]),
-                            "generated_at": datetime.fromisoformat(row[4]),
-                            "metadata": json.loads(row[5])
-                        })
-                    except Exception as e_inner:
-                        logger.warning(f"Skipping row due to parse error: {e_inner}, row={row}")
-                return results
+                return self._parse_rows(cursor.fetchall())
         except Exception as e:
             logger.error(f"Fetch session content failed: {e}")
             return []
 
     def get_all_content(self, skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get all content from all sessions, supports pagination"""
+        """Get all content from all sessions (summaries, see get_content_page), supports pagination"""
+        return self.get_content_page(skip=skip, limit=limit)[0]
+
+    def get_content_page(
+        self, skip: int = 0, limit: int = 10, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Get one page of content summaries, newest first, plus the cursor for the next page.
+
+        Items carry id, topic, generated_at, metadata and a short excerpt; the
+        body and citations are fetched on demand with `get_content`. With a `cursor` (from a previous page) the query seeks straight to the
+        (created_at, id) position instead of skipping rows, so deep pages cost
+        the same as the first one. Raises ValueError for a malformed cursor.
+        """
+        if cursor:
+            created_at, content_id = decode_cursor(cursor)
+            where, params = "WHERE (created_at, id) < (?, ?)", [created_at, content_id, limit]
+        else:
+            where, params = "", [limit, skip]
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("""
-                    SELECT id, topic, content, citations, generated_at, metadata
+            with self.connect() as conn:
+                cur = conn.execute(f"""
+                    SELECT id, topic, generated_at, metadata,
+                           CASE WHEN excerpt IS NULL AND encoding = 'raw'
+                                THEN substr(content, 1, {EXCERPT_CHARS}) ELSE excerpt END,
+                           created_at
                     FROM content
-                    ORDER BY created_at DESC
-                    LIMIT ? OFFSET ?
-                """, (limit, skip))
-                results = []
-                for row in cursor.fetchall():
-                    try:
-                        results.append({
-                            "id": row[0],
-                            "topic": row[1],
-                            "content": row[2],
-                            "citations": json.loads(row[3]),
-                            "generated_at": datetime.fromisoformat(row[4]),
-                            "metadata": json.loads(row[5])
-                        })
-                    except Exception as e_inner:
-                        logger.warning(f"Skipping row due to parse error: {e_inner}, row={row}")
-                return results
-        except Exception as e:
-            logger.error(f"Fetch all content failed: {e}")
+                    {where}
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ? {"" if cursor else "OFFSET ?"}
+                """, params)
+                rows = cur.fetchall()
+        except Exception as e:
+            logger.error(f"Fetch content page failed: {e}")
+            return [], None
+
+        next_cursor = encode_cursor(rows[-1][5], rows[-1][0]) if len(rows) == limit else None
+        results = []
+        for row in rows:
+            try:
+                results.append({
+                    "id": row[0],
+                    "topic": row[1],
+                    "generated_at": datetime.fromisoformat(row[2]),
+                    "metadata": json.loads(row[3]),
+                    "excerpt": make_excerpt(row[4] or ""),
+                })
+            except Exception as e_inner:
+                logger.warning(f"Skipping row due to parse error: {e_inner}, row={row}")
+        return results, next_cursor
+
+    def count_content(self) -> int:
+        """Total number of stored content rows (O(1), trigger-maintained)"""
+        try:
+            with self.connect() as conn:
+                row = conn.execute("SELECT total FROM content_stats WHERE id = 1").fetchone()
+                return row[0] if row else 0
+        except Exception as e:
+            logger.error(f"Count content failed: {e}")
+            return 0
+
+    def get_cached_result(self, key: str, max_age: float) -> Optional[Dict[str, Any]]:
+        """Return a cached generation younger than `max_age` seconds and mark it as used"""
+        now = time.time()
+        try:
+            with self.connect() as conn:
+                row = conn.execute(
+                    "SELECT payload FROM generation_cache WHERE key = ? AND created_at >= ?",
+                    (key, now - max_age),
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE generation_cache SET last_hit_at = ? WHERE key = ?", (now, key))
+                return json.loads(row[0])
+        except Exception as e:
+            logger.error(f"Fetch cached result failed: {e}")
+            return None
+
+    def put_cached_result(self, key: str, result: Dict[str, Any], max_entries: int, max_bytes: int):
+        """Store a generation, then evict least recently used entries beyond the limits"""
+        payload = json.dumps(result)
+        now = time.time()
+        try:
+            with self.connect() as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO generation_cache (key, payload, size, created_at, last_hit_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (key, payload, len(payload), now, now))
+                conn.execute("""
+                    DELETE FROM generation_cache WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key,
+                                   ROW_NUMBER() OVER (ORDER BY last_hit_at DESC) AS rank,
+                                   SUM(size) OVER (ORDER BY last_hit_at DESC) AS running_size
+                            FROM generation_cache
+                        )
+                        WHERE rank > ? OR running_size > ?
+                    )
+                """, (max_entries, max_bytes))
+        except Exception as e:
+            logger.error(f"Save cached result failed: {e}")
+
+    def save_research(self, topic_key: str, topic: str, report: str):
+        """Store (or refresh) the research report for a normalized topic"""
+        try:
+            with self.connect() as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO research (topic_key, topic, report, created_at)
+                    VALUES (?, ?, ?, ?)
+                """, (topic_key, topic, report, time.time()))
+        except Exception as e:
+            logger.error(f"Save research failed: {e}")
+
+    def get_research(self, topic_key: str, max_age: float) -> Optional[Dict[str, Any]]:
+        """Research for a normalized topic if it is younger than `max_age` seconds"""
+        try:
+            with self.connect() as conn:
+                row = conn.execute("""
+                    SELECT topic_key, topic, report, created_at FROM research
+                    WHERE topic_key = ? AND created_at >= ?
+                """, (topic_key, time.time() - max_age)).fetchone()
+        except Exception as e:
+            logger.error(f"Fetch research failed: {e}")
+            return None
+        if row is None:
+            return None
+        return {"topic_key": row[0], "topic": row[1], "report": row[2], "created_at": datetime.fromtimestamp(row[3])}
+
+    def get_research_index(self, max_age: float, limit: int = 50_000) -> List[Tuple[str, str, float]]:
+        """(topic_key, topic, created_at) of fresh research, oldest first, for the similarity index"""
+        try:
+            with self.connect() as conn:
+                return conn.execute("""
+                    SELECT topic_key, topic, created_at FROM (
+                        SELECT topic_key, topic, created_at FROM research
+                        WHERE created_at >= ?
+                        ORDER BY created_at DESC
+                        LIMIT ?
+                    ) ORDER BY created_at
+                """, (time.time() - max_age, limit)).fetchall()
+        except Exception as e:
+            logger.error(f"Fetch research index failed: {e}")
             return []
+
+    def search(self, query: str, skip: int = 0, limit: int = 10) -> Tuple[List[Dict[str, Any]], int]:
+        """Full-text search over topic and content, best matches first.
+
+        Returns (results, total). Topic matches weigh double; each result
+        carries a highlighted `snippet` instead of the full article body.
+        """
+        match = _fts_query(query)
+        if not match:
+            return [], 0
+        try:
+            with self.connect() as conn:
+                total = conn.execute("""
+                    SELECT COUNT(*) FROM content_fts
+                    JOIN content c ON c.rowid = content_fts.rowid
+                    WHERE content_fts MATCH ?
+                """, (match,)).fetchone()[0]
+                rows = conn.execute("""
+                    SELECT c.id, c.topic, c.generated_at, c.metadata, c.content, c.encoding,
+                           bm25(content_fts, 2.0, 1.0) AS score
+                    FROM content_fts
+                    JOIN content c ON c.rowid = content_fts.rowid
+                    WHERE content_fts MATCH ?
+                    ORDER BY score
+                    LIMIT ? OFFSET ?
+                """, (match, limit, skip)).fetchall()
+        except Exception as e:
+            logger.error(f"Search failed: {e}")
+            return [], 0
+
+        tokens = search_tokens(query)
+        results = []
+        for row in rows:
+            try:
+                results.append({
+                    "id": row[0],
+                    "topic": row[1],
+                    "generated_at": datetime.fromisoformat(row[2]),
+                    "metadata": json.loads(row[3]),
+                    "snippet": _snippet(_decode(row[5], row[4]), tokens),
+                    "score": -row[6],  # bm25 is lower-is-better; expose higher-is-better
+                })
+            except Exception as e_inner:
+                logger.warning(f"Skipping row due to parse error: {e_inner}, row={row}")
+        return results, total
+
+    def export_content(
+        self, cursor: Optional[str] = None, limit: int = 500
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Full rows, oldest first, with session_id and a UTC `created_at`, for copying to another store"""
+        where, params = "", [limit]
+        if cursor:
+            where, params = "WHERE (created_at, id) > (?, ?)", [*decode_cursor(cursor), limit]
+        with self.connect() as conn:
+            rows = conn.execute(f"""
+                SELECT id, topic, content, citations, generated_at, metadata, encoding, session_id, created_at
+                FROM content
+                {where}
+                ORDER BY created_at, id
+                LIMIT ?
+            """, params).fetchall()
+        items = self._parse_rows(rows)
+        for item, row in zip(items, rows):
+            item["session_id"] = row[7]
+            item["created_at"] = datetime.fromisoformat(row[8]).replace(tzinfo=timezone.utc)
+        next_cursor = encode_cursor(rows[-1][8], rows[-1][0]) if len(rows) == limit else None
+        return items, next_cursor
+
+    def import_content(self, rows: List[Dict[str, Any]]) -> int:
+        """Insert exported rows keeping their ids, sessions and timestamps; existing ids are skipped"""
+        with self.connect() as conn:
+            known = {
+                row[0] for row in conn.execute(
+                    f"SELECT id FROM content WHERE id IN ({','.join('?' * len(rows))})", [r["id"] for r in rows]
+                )
+            }
+            new = [row for row in rows if row["id"] not in known]
+            conn.executemany(
+                IMPORT_CONTENT_SQL,
+                [
+                    (*self._content_params(row["session_id"], row),
+                     row["created_at"].astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"))
+                    for row in new
+                ],
+            )
+            _index_content(conn, new)
+        for row in new:
+            self.known_sessions.set(row["session_id"], True)
+        return len(new)
+
+    def export_research(self) -> List[Tuple[str, str, str, float]]:
+        with self.connect() as conn:
+            return conn.execute("SELECT topic_key, topic, report, created_at FROM research ORDER BY created_at").fetchall()
+
+    def import_research(self, rows: List[Tuple[str, str, str, float]]) -> int:
+        """Insert research reports, keeping the newer one when a topic already exists"""
+        with self.connect() as conn:
+            conn.executemany("""
+                INSERT INTO research (topic_key, topic, report, created_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (topic_key) DO UPDATE SET
+                    topic = excluded.topic, report = excluded.report, created_at = excluded.created_at
+                WHERE excluded.created_at > research.created_at
+            """, rows)
+        return len(rows)
+
+    def reindex_search(self, batch_size: int = 500) -> int:
+        """Rebuild the full-text index from the content table; returns rows indexed.
+
+        Commits every `batch_size` rows so saves can interleave while the app
+        is running. Rows saved after the rebuild started index themselves.
+        """
+        with self.connect() as conn:
+            conn.execute("INSERT INTO content_fts (content_fts) VALUES ('delete-all')")
+            last_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM content").fetchone()[0]
+        done = 0
+        while done < last_rowid:
+            with self.connect() as conn:
+                # Bodies may be compressed, so they are decoded here rather than copied in SQL
+                batch = conn.execute("""
+                    SELECT rowid, id, topic, content, encoding FROM content
+                    WHERE rowid > ? AND rowid <= ?
+                    ORDER BY rowid
+                    LIMIT ?
+                """, (done, last_rowid, batch_size)).fetchall()
+                if not batch:
+                    break
+                done = batch[-1][0]
+                _index_content(conn, [
+                    {"id": cid, "topic": topic, "content": _decode(encoding, body)}
+                    for _, cid, topic, body, encoding in batch
+                ])
+        with self.connect() as conn:
+            conn.execute("INSERT INTO content_fts (content_fts) VALUES ('optimize')")
+            indexed = self._search_index_size(conn)
+        logger.info(f"Search index rebuilt: {indexed} rows")
+        return indexed
+
+    def compress_existing(self, batch_size: int = 500) -> int:
+        """Migration: re-encode rows stored raw and fill missing excerpts; returns rows rewritten"""
+        rewritten = 0
+        # Walk the table by rowid: rows too short to compress stay raw and would match again
+        last_rowid = 0
+        while True:
+            with self.connect() as conn:
+                rows = conn.execute("""
+                    SELECT rowid, id, content, citations, encoding FROM content
+                    WHERE rowid > ?
+                      AND ((encoding = 'raw' AND ? != 'raw' AND length(content) >= ?) OR excerpt IS NULL)
+                    ORDER BY rowid
+                    LIMIT ?
+                """, (last_rowid, self.compression, self.compress_min_bytes, batch_size)).fetchall()
+                if not rows:
+                    break
+                last_rowid = rows[-1][0]
+                updates = []
+                for _, cid, body, citations, encoding in rows:
+                    text, citations_json = _decode(encoding, body), _decode(encoding, citations)
+                    new_encoding = self._encoding_for(text)
+                    updates.append((
+                        _encode(new_encoding, text),
+                        _encode(new_encoding, citations_json),
+                        new_encoding,
+                        make_excerpt(text),
+                        cid,
+                    ))
+                conn.executemany(
+                    "UPDATE content SET content = ?, citations = ?, encoding = ?, excerpt = ? WHERE id = ?", updates
+                )
+            rewritten += len(rows)
+            logger.info(f"Compressed {rewritten} rows")
+        return rewritten
+
+    def _encoding_for(self, text: str) -> str:
+        return self.compression if len(text) >= self.compress_min_bytes else "raw"
+
+    def _content_params(self, session_id: str, content_data: Dict[str, Any]) -> Tuple:
+        encoding = self._encoding_for(content_data["content"])
+        return (
+            content_data["id"],
+            session_id,
+            content_data["topic"],
+            _encode(encoding, content_data["content"]),
+            _encode(encoding, json.dumps(content_data["citations"])),
+            content_data["generated_at"].isoformat(),
+            json.dumps(content_data["metadata"]),
+            encoding,
+            make_excerpt(content_data["content"]),
+        )
+
+    def _search_index_size(self, conn: Optional[sqlite3.Connection] = None) -> int:
+        conn = conn or self.connect()
+        return conn.execute("SELECT COUNT(*) FROM content_fts").fetchone()[0]
+
+    def _parse_rows(self, rows) -> List[Dict[str, Any]]:
+        results = []
+        for row in rows:
+            try:
+                results.append({
+                    "id": row[0],
+                    "topic": row[1],
+                    "content": _decode(row[6], row[2]),
+                    "citations": json.loads(_decode(row[6], row[3])),
+                    "generated_at": datetime.fromisoformat(row[4]),
+                    "metadata": json.loads(row[5])
+                })
+            except Exception as e_inner:
+                logger.warning(f"Skipping row due to parse error: {e_inner}, row={row}")
+        return results
+
+
+class AsyncContentDB:
+    """Awaitable facade over ContentDB for use from async request handlers.
+
+    Queries run on a small dedicated thread pool, each thread holding its own
+    pooled connection, so slow reads never block the event loop and DB work
+    never competes with crew runs for threads.
+    """
+
+    def __init__(self, db: ContentDB, max_workers: int = 4):
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="contentdb")
+
+    async def _call(self, fn, *args, **kwargs):
+        def timed():
+            with DB_QUERY_SECONDS.time(query=fn.__name__):
+                return fn(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, timed)
+
+    async def save_content(self, session_id: str, content_data: Dict[str, Any]):
+        return await self._call(self.db.save_content, session_id, content_data)
+
+    async def save_many(self, session_id: str, items: List[Dict[str, Any]]) -> int:
+        return await self._call(self.db.save_many, session_id, items)
+
+    async def session_has_content(self, session_id: str) -> bool:
+        # Known sessions are answered from memory without a thread hop
+        if self.db.known_sessions.get(session_id):
+            return True
+        return await self._call(self.db.session_has_content, session_id)
+
+    async def get_content(self, content_id: str) -> Optional[Dict[str, Any]]:
+        return await self._call(self.db.get_content, content_id)
+
+    async def get_topic_index(self, limit: int = 50_000) -> List[Tuple[str, str, Dict[str, Any]]]:
+        return await self._call(self.db.get_topic_index, limit)
+
+    async def get_session_content(self, session_id: str) -> List[Dict[str, Any]]:
+        return await self._call(self.db.get_session_content, session_id)
+
+    async def get_content_page(
+        self, skip: int = 0, limit: int = 10, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        return await self._call(self.db.get_content_page, skip=skip, limit=limit, cursor=cursor)
+
+    async def count_content(self) -> int:
+        return await self._call(self.db.count_content)
+
+    async def save_research(self, topic_key: str, topic: str, report: str):
+        return await self._call(self.db.save_research, topic_key, topic, report)
+
+    async def get_research(self, topic_key: str, max_age: float) -> Optional[Dict[str, Any]]:
+        return await self._call(self.db.get_research, topic_key, max_age)
+
+    async def get_research_index(self, max_age: float, limit: int = 50_000) -> List[Tuple[str, str, float]]:
+        return await self._call(self.db.get_research_index, max_age, limit)
+
+    async def search(self, query: str, skip: int = 0, limit: int = 10) -> Tuple[List[Dict[str, Any]], int]:
+        return await self._call(self.db.search, query, skip=skip, limit=limit)
+
+    async def ensure_search_index(self) -> int:
+        return await self._call(self.db.ensure_search_index)
+
+    async def get_cached_result(self, key: str, max_age: float) -> Optional[Dict[str, Any]]:
+        return await self._call(self.db.get_cached_result, key, max_age)
+
+    async def put_cached_result(self, key: str, result: Dict[str, Any], max_entries: int, max_bytes: int):
+        return await self._call(self.db.put_cached_result, key, result, max_entries, max_bytes)
+
+    async def export_content(
+        self, cursor: Optional[str] = None, limit: int = 500
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        return await self._call(self.db.export_content, cursor, limit)
+
+    async def import_content(self, rows: List[Dict[str, Any]]) -> int:
+        return await self._call(self.db.import_content, rows) if rows else 0
+
+    async def export_research(self) -> List[Tuple[str, str, str, float]]:
+        return await self._call(self.db.export_research)
+
+    async def import_research(self, rows: List[Tuple[str, str, str, float]]) -> int:
+        return await self._call(self.db.import_research, rows) if rows else 0
+
+    async def close(self):
+        # Waits for queries in flight without blocking the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown, True)
+        self.db.close()
+
+
+def _encode(encoding: str, text: str):
+    if encoding == "zlib":
+        return zlib.compress(text.encode(), 6)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=6).compress(text.encode())
+    return text
+
+
+def _decode(encoding: str, value) -> str:
+    if encoding == "zlib":
+        return zlib.decompress(value).decode()
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompress(value).decode()
+    return value
+
+
+def _index_content(conn: sqlite3.Connection, items: List[Dict[str, Any]]):
+    # Call after inserting the items: index rows take the rowid of their content row
+    conn.executemany(
+        "INSERT INTO content_fts (rowid, topic, content) SELECT rowid, ?, ? FROM content WHERE id = ?",
+        [(item["topic"], item["content"], item["id"]) for item in items],
+    )
+
+
+def _snippet(text: str, tokens: List[str], size: int = SNIPPET_WORDS) -> str:
+    """The `size`-word stretch of `text` with the most query words, each wrapped in <mark>.
+
+    An HTML fragment: article text comes from LLM and web output, so every
+    word is escaped and <mark> is the only markup in it. Words match on a shared prefix, a rough stand-in for the index's porter
+    stemming; the last query word matches as a prefix, as in _fts_query.
+    """
+    words = text.split()
+    stems = [token.casefold() if len(token) <= 4 else token.casefold()[:-1] for token in tokens]
+    hits = [any(part.startswith(stem) for part in search_tokens(word.casefold()) for stem in stems) for word in words]
+    start, best = 0, sum(hits[:size])
+    window = best
+    for i in range(1, len(words) - size + 1):
+        window += hits[i + size - 1] - hits[i - 1]
+        if window > best:
+            start, best = i, window
+    shown = [
+        f"<mark>{html.escape(word)}</mark>" if hit else html.escape(word)
+        for word, hit in zip(words[start:start + size], hits[start:start + size])
+    ]
+    return ("…" if start else "") + " ".join(shown) + ("…" if start + size < len(words) else "")
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query: all words must match, the last as a prefix"""
+    tokens = search_tokens(query)
+    if not tokens:
+        return ""
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+if __name__ == "__main__":
+    # Maintenance commands, e.g. `python db.py reindex [path/to/content.db]`
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] not in ("reindex", "compress"):
+        print("usage: python db.py reindex|compress [db_path]")
+        sys.exit(2)
+    command, db_path = sys.argv[1], (sys.argv[2] if len(sys.argv) > 2 else "content.db")
+    if command == "reindex":
+        print(f"Indexed {ContentDB(db_path).reindex_search()} rows")
+    elif command == "compress":
+        import os
+        compression = os.getenv("CONTENT_COMPRESSION", "zlib")
+        db = ContentDB(db_path, compression="raw" if compression == "none" else compression)
+        print(f"Rewrote {db.compress_existing()} rows")
+        # Hand the freed pages back to the filesystem
+        db.connect().execute("VACUUM")
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from cancellation import CancelToken, Cancelled
+from metrics import GENERATIONS_CANCELLED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class Job:
+    id: str
+    session_id: str
+    request: Any
+    state: JobState = JobState.QUEUED
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    # Deadline and cancellation of this job's generation; the handler runs with it as current_cancel
+    cancel: CancelToken = field(default_factory=CancelToken)
+    # Runs this job instead of the queue's handler
+    handler: Optional["JobHandler"] = None
+    finished: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.state in (JobState.SUCCEEDED, JobState.FAILED, JobState.CANCELLED)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+
+JobHandler = Callable[[Job], Awaitable[Dict[str, Any]]]
+
+
+class JobQueue:
+    """Bounded in-process job queue drained by a fixed pool of async workers.
+
+    `submit` never blocks: when `max_size` jobs are already waiting it raises
+    `QueueFullError` so the caller can shed load. Finished jobs are kept in a
+    bounded history (`retention`) so clients can poll for their result.
+    Jobs whose CancelToken fires while queued are dropped without running.
+    """
+
+    def __init__(self, handler: JobHandler, workers: int = 2, max_size: int = 20, retention: int = 1000):
+        self.handler = handler
+        self.workers = workers
+        self.max_size = max_size
+        self.retention = retention
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._pending_sessions: Counter = Counter()
+
+    async def start(self):
+        """Spawn the worker tasks on the running event loop"""
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"job-worker-{n}")
+            for n in range(self.workers)
+        ]
+        logger.info(f"Job queue started: {self.workers} workers, max {self.max_size} queued")
+
+    async def stop(self):
+        """Cancel the workers; queued jobs that never started are marked failed"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self._jobs.values():
+            if not job.done:
+                self._finish(job, JobState.FAILED, error="Server shutting down")
+
+    def submit(
+        self, session_id: str, request: Any, cancel: Optional[CancelToken] = None, handler: Optional[JobHandler] = None
+    ) -> Job:
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        job = Job(
+            id=str(uuid.uuid4()), session_id=session_id, request=request, cancel=cancel or CancelToken(), handler=handler
+        )
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.max_size} waiting)")
+        self._jobs[job.id] = job
+        self._pending_sessions[session_id] += 1
+        self._trim()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def room(self) -> int:
+        """How many more jobs submit() accepts right now"""
+        return self.max_size - self._queue.qsize() if self._queue else 0
+
+    async def wait(self, job: Job) -> Job:
+        """Wait until the job has finished, whatever its outcome"""
+        await job.finished.wait()
+        return job
+
+    def cancel(self, job: Job, reason: str = "cancelled"):
+        """Stop a job: a queued one is finished right away, a running one at its next checkpoint"""
+        job.cancel.cancel(reason)
+        if job.state == JobState.QUEUED:
+            self._cancelled(job)
+
+    def has_pending(self, session_id: str) -> bool:
+        """True if the session already has a job that is queued or running"""
+        return self._pending_sessions[session_id] > 0
+
+    def position(self, job: Job) -> Optional[int]:
+        """1-based position among queued jobs, None once the job has started"""
+        if job.state != JobState.QUEUED:
+            return None
+        queued = [j for j in self._jobs.values() if j.state == JobState.QUEUED]
+        return queued.index(job) + 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "max_size": self.max_size,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": sum(1 for j in self._jobs.values() if j.state == JobState.RUNNING),
+        }
+
+    async def _worker(self, n: int):
+        while True:
+            job = await self._queue.get()
+            if job.done or job.cancel.poll():
+                # Cancelled, overdue or abandoned while it waited
+                if not job.done:
+                    self._cancelled(job)
+                self._queue.task_done()
+                continue
+            job.state = JobState.RUNNING
+            job.started_at = datetime.now()
+            try:
+                result = await (job.handler or self.handler)(job)
+            except asyncio.CancelledError:
+                self._finish(job, JobState.FAILED, error="Server shutting down")
+                raise
+            except Cancelled as e:
+                self._finish(job, JobState.CANCELLED, error=str(e))
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                self._finish(job, JobState.FAILED, error=getattr(e, "detail", None) or str(e))
+            else:
+                self._finish(job, JobState.SUCCEEDED, result=result)
+            finally:
+                self._queue.task_done()
+
+    def _cancelled(self, job: Job):
+        GENERATIONS_CANCELLED_TOTAL.inc(reason=job.cancel.reason, stage="queued")
+        self._finish(job, JobState.CANCELLED, error=str(Cancelled(job.cancel.reason)))
+
+    def _finish(self, job: Job, state: JobState, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        self._pending_sessions[job.session_id] -= 1
+        if self._pending_sessions[job.session_id] <= 0:
+            del self._pending_sessions[job.session_id]
+        job.state = state
+        job.result = result
+        job.error = error
+        job.finished_at = datetime.now()
+        job.finished.set()
+
+    def _trim(self):
+        # Only finished jobs are evicted; pending ones are bounded by the queue itself
+        excess = len(self._jobs) - self.retention
+        if excess <= 0:
+            return
+        for job_id in [jid for jid, j in self._jobs.items() if j.done][:excess]:
+            del self._jobs[job_id]
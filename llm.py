@@ -0,0 +1,158 @@
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from crewai import BaseLLM, LLM
+
+from metrics import LLM_FALLBACKS_TOTAL
+from resilience import Dependency
+
+logger = logging.getLogger(__name__)
+
+# The ContentRequest being served by this thread; set next to current_progress in ContentService
+current_request: ContextVar[Optional[Any]] = ContextVar("current_request", default=None)
+
+# litellm exception class names worth retrying on another model
+FALLBACK_ERRORS = frozenset({
+    "Timeout",
+    "APITimeoutError",
+    "RateLimitError",
+    "APIConnectionError",
+    "ServiceUnavailableError",
+    "InternalServerError",
+    # resilience.CircuitOpenError: the model is failing, go straight to the next one
+    "CircuitOpenError",
+})
+
+
+def parse_overrides(spec: str) -> Dict[str, str]:
+    """'social_post=gpt-4o-mini, whitepaper=gpt-4o' -> {'social_post': 'gpt-4o-mini', ...}"""
+    overrides = {}
+    for pair in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, model = pair.partition("=")
+        if key.strip() and model.strip():
+            overrides[key.strip()] = model.strip()
+    return overrides
+
+
+def is_fallback_error(error: BaseException) -> bool:
+    return any(cls.__name__ in FALLBACK_ERRORS for cls in type(error).__mro__)
+
+
+class ModelRouter:
+    """Chooses the model chain for each generation stage.
+
+    Research defaults to a cheaper model since it is mostly tool calls and
+    summarizing; writing uses `writer_model`, overridden per content type or
+    by `long_form_model` for long articles. Every chain ends with the
+    `fallbacks` not already in it, tried in order on timeouts and rate limits.
+    Calls to each model go through its own `guard` (retries, hedging and a
+    circuit breaker, see resilience.py) before falling back.
+    """
+
+    def __init__(
+        self,
+        llm_factory: Callable[..., BaseLLM],
+        research_model: str,
+        writer_model: str,
+        fallbacks: List[str],
+        writer_by_type: Optional[Dict[str, str]] = None,
+        long_form_model: Optional[str] = None,
+        long_form_words: int = 1500,
+        guard_factory: Optional[Callable[[str], Dependency]] = None,
+    ):
+        self.llm_factory = llm_factory
+        self.research_model = research_model
+        self.writer_model = writer_model
+        self.fallbacks = fallbacks
+        self.writer_by_type = writer_by_type or {}
+        self.long_form_model = long_form_model
+        self.long_form_words = long_form_words
+        self.guard_factory = guard_factory or (lambda model: Dependency(f"llm:{model}", is_fallback_error))
+        self._llms: Dict[Tuple[str, bool], BaseLLM] = {}
+        self._guards: Dict[str, Dependency] = {}
+        self._lock = threading.Lock()
+
+    def model_for(self, stage: str, request: Optional[Any] = None) -> str:
+        if stage == "research":
+            return self.research_model
+        if request is not None:
+            if self.long_form_model and (request.word_count or 0) >= self.long_form_words:
+                return self.long_form_model
+            if request.content_type in self.writer_by_type:
+                return self.writer_by_type[request.content_type]
+        return self.writer_model
+
+    def plan(self, request: Any) -> Dict[str, str]:
+        """Primary model per stage for `request`, recorded in the article metadata"""
+        return {stage: self.model_for(stage, request) for stage in ("research", "writing")}
+
+    def chain(self, stage: str, request: Optional[Any] = None) -> List[str]:
+        primary = self.model_for(stage, request)
+        return [primary] + [model for model in self.fallbacks if model != primary]
+
+    def llm(self, model: str, stream: bool = False) -> BaseLLM:
+        """Shared client per (model, stream); crewai LLM objects are stateless between calls"""
+        with self._lock:
+            if (model, stream) not in self._llms:
+                self._llms[(model, stream)] = self.llm_factory(model=model, stream=stream)
+            return self._llms[(model, stream)]
+
+    def guard(self, model: str) -> Dependency:
+        """One Dependency per model, shared by both stages and by streamed and plain calls"""
+        with self._lock:
+            if model not in self._guards:
+                self._guards[model] = self.guard_factory(model)
+            return self._guards[model]
+
+
+class RoutedLLM(BaseLLM):
+    """The LLM handed to a stage's agents; resolves the concrete model per call.
+
+    Pooled crews are built once, so the per-request choice (word count,
+    content type) is read from `current_request` at call time. On an error in
+    FALLBACK_ERRORS the next model of the chain gets the same messages.
+    """
+
+    def __init__(self, router: ModelRouter, stage: str, stream: bool = False):
+        super().__init__(model=f"router:{stage}")
+        self.router = router
+        self.stage = stage
+        self.stream = stream
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs) -> Any:
+        chain = self.router.chain(self.stage, current_request.get())
+        for attempt, model in enumerate(chain):
+            llm = self.router.llm(model, self.stream)
+            # crewai's executor sets stop words (e.g. "\nObservation:") on the agent's LLM, i.e. on us
+            llm.stop = self.stop
+            try:
+                # Every agent step is an LLM call; the guard also stops a cancelled or overdue generation here.
+                # Streamed tokens and executed functions must not happen twice, so those calls aren't hedged
+                return self.router.guard(model).call(
+                    lambda: llm.call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs),
+                    hedge=not (self.stream or available_functions),
+                )
+            except Exception as e:
+                if attempt == len(chain) - 1 or not is_fallback_error(e):
+                    raise
+                logger.warning(f"{self.stage}: {model} failed ({type(e).__name__}), falling back to {chain[attempt + 1]}")
+                LLM_FALLBACKS_TOTAL.inc(stage=self.stage, model=model, reason=type(e).__name__)
+
+    def supports_function_calling(self) -> bool:
+        return self.router.llm(self.router.model_for(self.stage), self.stream).supports_function_calling()
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        # The smallest window of the chain, so a fallback never receives an oversized prompt
+        return min(self.router.llm(model, self.stream).get_context_window_size() for model in self.router.chain(self.stage))
+
+
+def openai_llm(api_key: Optional[str], timeout: float) -> Callable[..., BaseLLM]:
+    """Factory for ModelRouter building crewai LLMs with a per-call timeout"""
+    def build(model: str, stream: bool = False) -> BaseLLM:
+        return LLM(model=model, api_key=api_key, stream=stream, timeout=timeout)
+    return build
@@ -1,42 +1,118 @@
-from fastapi import FastAPI, HTTPException, Response, Cookie, Query
+from fastapi import FastAPI, HTTPException, Request, Response, Cookie, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from crewai import Agent, Task, Crew, Process, LLM
-from crewai_tools import SerperDevTool
 
 import os
+import math
+import hashlib
 import anyio
 import logging
 import uuid
 import re
-from typing import Optional, Dict, Any, List
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Optional, Dict, Any, List, Set, Tuple
 from datetime import datetime
 from dotenv import load_dotenv
-from db import ContentDB  # Import our simple DB module
+from storage import open_store
+from cancellation import CancelToken, Cancelled, current_cancel
+from jobs import Job, JobQueue, JobState, QueueFullError
+from cache import ResultCache, TTLCache, bucket_word_count, normalize_topic, request_key
+from progress import ProgressChannel, sse_frame
+from similarity import SemanticIndex, content_words
+from ratelimit import MemoryBucketStore, RateLimiter, Rule, SQLiteBucketStore
+import metrics
+import resilience
+from metrics import GENERATIONS_TOTAL, QUEUE_WAIT_SECONDS, RATE_LIMITED_TOTAL, RESEARCH_REUSE_TOTAL, SIMILAR_REUSE_TOTAL
+
+if TYPE_CHECKING:
+    from service import ContentService  # imported lazily, see boot()
 
 # -------------------- ENV & LOGGING --------------------
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-required_vars = ["SERPER_API_KEY", "OPENAI_API_KEY"]
+required_vars = ["OPENAI_API_KEY"]
+if os.getenv("SEARCH_BACKEND") != "stub":
+    required_vars.append("SERPER_API_KEY")
 missing_vars = [var for var in required_vars if not os.getenv(var)]
 if missing_vars:
     raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
-# -------------------- INIT LLM, TOOLS & DB --------------------
-myllm = LLM(
-    model="gpt-3.5-turbo",
-    api_key=os.getenv("OPENAI_API_KEY")
+# Concurrent crew runs and how many more may wait before /generate sheds load
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "2"))
+GENERATION_QUEUE_SIZE = int(os.getenv("GENERATION_QUEUE_SIZE", "20"))
+# Seconds a generation may take end to end, queueing included; requests may ask for up to the maximum
+GENERATION_TIMEOUT = float(os.getenv("GENERATION_TIMEOUT", "600"))
+GENERATION_MAX_TIMEOUT = float(os.getenv("GENERATION_MAX_TIMEOUT", "1800"))
+# A /generate job nobody has polled for this long is cancelled (0 keeps it running)
+JOB_ABANDON_AFTER = float(os.getenv("JOB_ABANDON_AFTER", "120"))
+# "lazy": serve right away and load crewai in the background; "eager": load it before serving
+BOOT_MODE = os.getenv("BOOT_MODE", "lazy")
+
+# -------------------- INIT DB & CACHES --------------------
+# Article bodies and citations are stored compressed (CONTENT_COMPRESSION=none|zlib|zstd)
+CONTENT_COMPRESSION = os.getenv("CONTENT_COMPRESSION", "zlib")
+# DATABASE_URL=postgresql://... shares one store across nodes; otherwise a local SQLite file.
+# Nothing is opened here: the schema is created or migrated on first use, i.e. by boot()
+adb = open_store(
+    os.getenv("DATABASE_URL") or os.getenv("CONTENT_DB_PATH", "content.db"),
+    compression="raw" if CONTENT_COMPRESSION == "none" else CONTENT_COMPRESSION,
+    threads=int(os.getenv("DB_THREADS", "4")),
+    pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
 )
-serper_tool = SerperDevTool()
-db = ContentDB()
+# Identical requests (folded topic, same type, word count within 100) reuse one crew run
+result_cache = ResultCache(
+    adb,
+    ttl=float(os.getenv("RESULT_CACHE_TTL", "86400")),
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000")),
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", "50000000")),
+)
+# Rendered GET /content/{id} bodies of recently generated or viewed articles, bounded by count and bytes
+content_hot_cache = TTLCache(
+    max_size=int(os.getenv("CONTENT_CACHE_ITEMS", "1000")),
+    ttl=float("inf"),  # articles never change once saved
+    max_bytes=int(os.getenv("CONTENT_CACHE_BYTES", str(32 * 1024 * 1024))),
+)
+CONTENT_CACHE_CONTROL = f"public, max-age={int(os.getenv('CONTENT_MAX_AGE', '86400'))}"
+# Paraphrased topics ("AI in healthcare" / "healthcare artificial intelligence") reuse a prior article
+semantic_index = SemanticIndex(max_items=int(os.getenv("SIMILAR_INDEX_SIZE", "50000")))
+SIMILAR_REUSE_THRESHOLD = float(os.getenv("SIMILAR_REUSE_THRESHOLD", "0.85"))
+# Research younger than this is reused for other content types/lengths on the same (or a near-identical) topic
+RESEARCH_MAX_AGE = float(os.getenv("RESEARCH_MAX_AGE", str(3 * 86400)))
+RESEARCH_SEED_THRESHOLD = float(os.getenv("RESEARCH_SEED_THRESHOLD", "0.9"))
+research_index = SemanticIndex(max_items=int(os.getenv("SIMILAR_INDEX_SIZE", "50000")))
+# Dedicated thread budget for crew runs so they never starve anyio's default limiter
+generation_limiter = anyio.CapacityLimiter(GENERATION_WORKERS)
+# Token buckets ("burst/seconds", "off" disables) checked before any generation is accepted;
+# RATE_LIMIT_DB shares them between uvicorn workers through a SQLite file
+rate_limiter = RateLimiter(
+    SQLiteBucketStore(os.getenv("RATE_LIMIT_DB")) if os.getenv("RATE_LIMIT_DB") else MemoryBucketStore(),
+    {
+        "session": Rule.parse(os.getenv("RATE_LIMIT_SESSION", "3/60")),
+        "client": Rule.parse(os.getenv("RATE_LIMIT_CLIENT", "10/60")),
+        "global": Rule.parse(os.getenv("RATE_LIMIT_GLOBAL", "60/60")),
+    },
+)
+# Behind a proxy every request comes from the proxy's address and the client bucket would be shared by
+# everyone, so take the client address from X-Forwarded-For instead. On by default on Render (which sets
+# RENDER and the header); elsewhere set TRUST_FORWARDED_FOR=1 only behind a proxy that sets the header
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "1" if os.getenv("RENDER") else "0") == "1"
 
 # -------------------- MODELS --------------------
 class ContentRequest(BaseModel):
     topic: str = Field(..., min_length=3, max_length=200)
     content_type: Optional[str] = Field(default="blog_post")
     word_count: Optional[int] = Field(default=800, ge=20, le=2000)
+    timeout: Optional[float] = Field(
+        default=None, gt=0, le=GENERATION_MAX_TIMEOUT, description="Seconds before the generation is abandoned"
+    )
+
+    def cancel_token(self, idle_timeout: Optional[float] = None) -> CancelToken:
+        return CancelToken(timeout=self.timeout or GENERATION_TIMEOUT, idle_timeout=idle_timeout)
 
 class ContentResponse(BaseModel):
     id: str
@@ -46,123 +122,274 @@ class ContentResponse(BaseModel):
     generated_at: datetime
     metadata: Dict[str, Any]
 
-# -------------------- SERVICE --------------------
-class ContentService:
-    def __init__(self):
-        self.researcher = Agent(
-            role="Senior Research Analyst",
-            goal="Conduct thorough research using credible web sources",
-            backstory="""You are an experienced research analyst who excels at finding 
-            the latest information from web sources, industry news, and reports.""",
-            verbose=True,
-            allow_delegation=False,
-            tools=[serper_tool],
-            llm=myllm,
-        )
-        self.writer = Agent(
-            role="Expert Content Writer",
-            goal="Create engaging, well-structured content based on research",
-            backstory="""You are a professional content writer who transforms research 
-            into compelling, accessible content.""",
-            verbose=True,
-            allow_delegation=False,
-            llm=myllm,
-        )
+class BatchContentRequest(BaseModel):
+    items: List[ContentRequest] = Field(..., min_length=1, max_length=50)
 
-    def create_research_task(self, request: ContentRequest) -> Task:
-        return Task(
-            description=f"Research the topic: {request.topic}\n\n"
-            "Use web search to find:\n"
-            "- Latest news, trends, and industry developments\n"
-            "- Key facts, statistics, and data points\n"
-            "- Expert insights and opinions\n"
-            "- Practical applications and real-world examples\n\n"
-            "IMPORTANT: Collect citation info (Title | Author | Date | URL | Web).",
-            expected_output="""A research report with:
-            1. Key findings
-            2. Statistics
-            3. Trends
-            4. Bibliography""",
-            agent=self.researcher,
-        )
+class BatchItemResult(BaseModel):
+    index: int
+    status: str  # "succeeded", "duplicate" (shares the result of `duplicate_of`) or "failed"
+    id: Optional[str] = None
+    duplicate_of: Optional[int] = None
+    error: Optional[str] = None
+    result: Optional[ContentResponse] = None
 
-    def create_writing_task(self, request: ContentRequest) -> Task:
-        return Task(
-            description=f"""
-            Create a {request.content_type} about: {request.topic}
-            
-            Requirements:
-            - ~{request.word_count} words
-            - Engaging headline
-            - Structured with subheadings
-            - Clear intro & conclusion
-            - Based on research findings
-            - Use in-text citations [1], [2], etc.
-            """,
-            expected_output="A polished article with proper citations & references.",
-            agent=self.writer,
-        )
+class BatchResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    items: List[BatchItemResult]
 
-    def extract_citations(self, content: str) -> List[Dict[str, Any]]:
-        citations = []
-        lines = content.splitlines()
-        in_references = False
-        citation_count = 0
-
-        for line in lines:
-            line = line.strip()
-            if not in_references and "references" in line.lower():
-                in_references = True
-                continue
-
-            if in_references and line.startswith("["):
-                try:
-                    # Format: [1] Title | Author | Date | URL | Web
-                    match = re.match(r"^\[\d+\]\s*(.*?)\s*\|\s*(.*?)\s*\|\s*(.*?)\s*\|\s*(.*?)$", line)
-                    if match:
-                        citation_count += 1
-                        citations.append({
-                            "number": citation_count,
-                            "title": match.group(1),
-                            "author": match.group(2),
-                            "date": match.group(3),
-                            "url": match.group(4),
-                            "type": "Web",
-                        })
-                except Exception as e:
-                    logger.warning(f"Failed to parse citation: {line}, Error: {e}")
-
-        return citations
-
-    async def generate_content(self, request: ContentRequest) -> Dict[str, Any]:
-        research_task = self.create_research_task(request)
-        writing_task = self.create_writing_task(request)
-
-        crew = Crew(
-            agents=[self.researcher, self.writer],
-            tasks=[research_task, writing_task],
-            process=Process.sequential,
-            verbose=True,
+class JobResponse(BaseModel):
+    id: str
+    status: JobState
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    queue_position: Optional[int] = None
+    result: Optional[ContentResponse] = None
+    error: Optional[str] = None
+
+# -------------------- BOOT --------------------
+# Set by boot() once crewai is imported; generation waits for it, everything else serves immediately
+content_service: Optional["ContentService"] = None
+boot_state: Dict[str, Any] = {"stage": "starting", "error": None, "seconds": None}
+service_loaded = asyncio.Event()
+# /search answers with "indexing": true until build_search_index() has finished
+search_index_state: Dict[str, Any] = {"stage": "pending", "indexed": None, "seconds": None}
+
+def load_content_service() -> "ContentService":
+    from service import ContentService  # crewai, crewai_tools, litellm: the slow part of start-up
+
+    return ContentService(generation_limiter)
+
+async def build_indexes():
+    topics = await adb.get_topic_index(semantic_index.max_items)
+    await anyio.to_thread.run_sync(
+        semantic_index.build,
+        [(cid, topic, similarity_meta(topic, meta.get("content_type"), meta.get("word_count"))) for cid, topic, meta in topics],
+    )
+    research = await adb.get_research_index(RESEARCH_MAX_AGE, research_index.max_items)
+    await anyio.to_thread.run_sync(
+        research_index.build, [(key, topic, {"created_at": created_at}) for key, topic, created_at in research]
+    )
+
+async def build_search_index():
+    """Background start-up: fill the full-text index for content stored before it existed"""
+    search_index_state["stage"] = "building"
+    start = time.perf_counter()
+    indexed = await adb.ensure_search_index()
+    search_index_state.update(stage="ready", indexed=indexed, seconds=round(time.perf_counter() - start, 3))
+
+async def boot():
+    """Background start-up: topic indexes, then the generation service, then the crew pool"""
+    global content_service
+    start = time.perf_counter()
+    try:
+        boot_state["stage"] = "indexing"
+        await build_indexes()
+        boot_state["stage"] = "loading"
+        content_service = await anyio.to_thread.run_sync(load_content_service)
+        service_loaded.set()
+        boot_state["stage"] = "warming"
+        await anyio.to_thread.run_sync(content_service.crew_pool.warm_up)
+        boot_state["stage"] = "ready"
+        logger.info(f"Generation ready after {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        logger.error(f"Boot failed: {e}")
+        boot_state.update(stage="failed", error=str(e))
+        # Wake waiting generations so they fail fast instead of hanging
+        service_loaded.set()
+    finally:
+        boot_state["seconds"] = round(time.perf_counter() - start, 3)
+
+async def generation_service() -> "ContentService":
+    """The loaded ContentService, waiting for boot() if it is still importing crewai"""
+    await service_loaded.wait()
+    if content_service is None:
+        raise HTTPException(status_code=503, detail="Content generation is unavailable")
+    return content_service
+
+# -------------------- JOBS --------------------
+
+def build_content_data(content_id: str, request: ContentRequest, result: Dict[str, Any], cache_source: str) -> Dict[str, Any]:
+    return {
+        "id": content_id,
+        "topic": request.topic,
+        "content": result["content"],
+        "citations": result["citations"],
+        "generated_at": datetime.now(),
+        "metadata": {
+            "content_type": request.content_type,
+            "word_count": request.word_count,
+            "actual_words": len(re.findall(r'\w+', result["content"])),
+            "total_citations": len(result["citations"]),
+            "cache": cache_source,
+            **({"reused_from": result["reused_from"]} if result.get("reused_from") else {}),
+            **({"research": result["research_source"]} if result.get("research_source") else {}),
+            **({"citation_issues": result["citation_issues"]} if result.get("citation_issues") else {}),
+            **({"models": result["models"]} if result.get("models") else {}),
+            **({"research_tokens": result["research_tokens"]} if result.get("research_tokens") else {}),
+        },
+    }
+
+def similarity_meta(topic: str, content_type: Optional[str], word_count: Optional[int]) -> Dict[str, Any]:
+    # Reuse also needs the same content words: a close score alone lets "AI in education policy" take "AI in education"
+    return {"content_type": content_type, "word_bucket": bucket_word_count(word_count), "words": content_words(topic)}
+
+async def reuse_similar(request: ContentRequest) -> Optional[Dict[str, Any]]:
+    """A stored article whose topic is a near-duplicate of this request (same type and length), if any"""
+    if SIMILAR_REUSE_THRESHOLD > 1:
+        return None
+    wanted = similarity_meta(request.topic, request.content_type, request.word_count)
+    matches = await anyio.to_thread.run_sync(
+        lambda: semantic_index.query(request.topic, min_score=SIMILAR_REUSE_THRESHOLD, where=lambda meta: meta == wanted)
+    )
+    if not matches:
+        return None
+    score, content_id, _ = matches[0]
+    prior = await adb.get_content(content_id)
+    if not prior:
+        return None
+    SIMILAR_REUSE_TOTAL.inc()
+    logger.info(f"Reusing {content_id} ({prior['topic']!r}, similarity {score:.2f}) for {request.topic!r}")
+    return {
+        "content": prior["content"],
+        "citations": prior["citations"],
+        "research_summary": "",
+        "reused_from": {"id": content_id, "topic": prior["topic"], "similarity": round(score, 3)},
+    }
+
+async def fresh_research(request: ContentRequest) -> Optional[Dict[str, Any]]:
+    """Stored research for this topic, or for a near-identical one, that is still fresh"""
+    topic_key = normalize_topic(request.topic)
+    stored = await adb.get_research(topic_key, RESEARCH_MAX_AGE)
+    if stored or RESEARCH_SEED_THRESHOLD > 1:
+        return stored
+    cutoff = time.time() - RESEARCH_MAX_AGE
+    matches = await anyio.to_thread.run_sync(
+        lambda: research_index.query(
+            request.topic, min_score=RESEARCH_SEED_THRESHOLD, where=lambda meta: meta["created_at"] >= cutoff
         )
+    )
+    if not matches:
+        return None
+    return await adb.get_research(matches[0][1], RESEARCH_MAX_AGE)
+
+async def generate_fresh(request: ContentRequest, progress: Optional[ProgressChannel] = None) -> Dict[str, Any]:
+    reused = await reuse_similar(request)
+    if reused:
+        if progress:
+            progress.emit("reused", **reused["reused_from"])
+        return reused
+
+    stored = await fresh_research(request)
+    if stored:
+        RESEARCH_REUSE_TOTAL.inc()
+        logger.info(f"Writing {request.topic!r} from stored research on {stored['topic']!r}")
+        service = await generation_service()
+        result = await service.generate_content(request, progress, research=stored["report"])
+        result["research_source"] = "reused"
+        return result
+
+    service = await generation_service()
+    result = await service.generate_content(request, progress)
+    result["research_source"] = "generated"
+    topic_key = normalize_topic(request.topic)
+    await adb.save_research(topic_key, request.topic, result["research_summary"])
+    research_index.add(topic_key, request.topic, {"created_at": time.time()})
+    return result
+
+def render_content(item: Dict[str, Any]) -> Tuple[str, bytes]:
+    """(strong ETag, JSON body) of a stored article as served by GET /content/{id}"""
+    body = ContentResponse(**item).model_dump_json().encode()
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"', body
+
+def cache_content(item: Dict[str, Any]) -> Tuple[str, bytes]:
+    etag, body = render_content(item)
+    content_hot_cache.set(item["id"], (etag, body), size=len(body))
+    return etag, body
+
+async def save_generated(session_id: str, items: List[Dict[str, Any]]):
+    """Persist new articles in one transaction, warm the hot cache and make their topics findable for
+    near-duplicate reuse; 500 if they could not be saved (nothing is, then)"""
+    if await adb.save_many(session_id, items) != len(items):
+        raise HTTPException(status_code=500, detail="Saving the generated content failed")
+    for item in items:
+        cache_content(item)
+        if "reused_from" not in item["metadata"]:
+            meta = similarity_meta(item["topic"], item["metadata"]["content_type"], item["metadata"]["word_count"])
+            semantic_index.add(item["id"], item["topic"], meta)
+
+async def generate_cached(
+    request: ContentRequest, progress: Optional[ProgressChannel] = None
+) -> Tuple[Dict[str, Any], str]:
+    result, cache_source = await result_cache.get_or_create(
+        request_key(request.topic, request.content_type, request.word_count),
+        lambda: generate_fresh(request, progress),
+    )
+    GENERATIONS_TOTAL.inc(outcome=cache_source)
+    return result, cache_source
+
+async def generate_job(job: Job) -> Dict[str, Any]:
+    """Generate a job's article without saving it; the handler of /generate/batch items, which are saved together"""
+    QUEUE_WAIT_SECONDS.observe((job.started_at - job.created_at).total_seconds())
+    # Workers are long-lived tasks, so the job's token is set and reset around each job
+    token = current_cancel.set(job.cancel)
+    try:
+        result, cache_source = await generate_cached(job.request)
+    finally:
+        current_cancel.reset(token)
+    return build_content_data(job.id, job.request, result, cache_source)
+
+async def run_generation_job(job: Job) -> Dict[str, Any]:
+    content_data = await generate_job(job)
+    await save_generated(job.session_id, [content_data])
+    return content_data
+
+job_queue = JobQueue(
+    run_generation_job,
+    workers=GENERATION_WORKERS,
+    max_size=GENERATION_QUEUE_SIZE,
+)
 
-        try:
-            result = await anyio.to_thread.run_sync(crew.kickoff)
-        except Exception as e:
-            logger.error(f"Content generation failed: {e}")
-            raise HTTPException(status_code=500, detail="Content generation failed")
-
-        content_str = str(result)
-        citations = self.extract_citations(content_str)
-
-        return {
-            "content": content_str,
-            "citations": citations,
-            "research_summary": str(getattr(research_task, "output", "Research completed")),
-        }
+def job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        id=job.id,
+        status=job.state,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        queue_position=job_queue.position(job),
+        result=ContentResponse(**job.result) if job.result else None,
+        error=job.error,
+    )
+
+async def cancel_on_disconnect(http_request: Request, jobs: List[Job], interval: float = 1.0):
+    """Cancel `jobs` once the client goes away; run as a task next to the request waiting for them"""
+    while not all(job.done for job in jobs):
+        if await http_request.is_disconnected():
+            for job in jobs:
+                if not job.done:
+                    job_queue.cancel(job, "disconnected")
+            return
+        await asyncio.sleep(interval)
 
 # -------------------- APP --------------------
-content_service = ContentService()
-app = FastAPI(title="AI Content Generator", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_queue.start()
+    # Queued jobs simply wait in generation_service() until the background boot has loaded crewai
+    boot_task = asyncio.create_task(boot())
+    index_task = asyncio.create_task(build_search_index())
+    if BOOT_MODE == "eager":
+        await boot_task
+    yield
+    boot_task.cancel()
+    index_task.cancel()
+    await job_queue.stop()
+    await adb.close()
+
+app = FastAPI(title="AI Content Generator", version="1.0.0", lifespan=lifespan)
 
 # CORS
 
@@ -187,69 +414,323 @@ app.add_middleware(
 async def root():
     return {"message": "AI Content Generator API", "status": "running"}
 
-@app.post("/generate")
-async def generate_content(
-    request: ContentRequest, response: Response, session_id: Optional[str] = Cookie(None)
-):
+# Sessions between claim_session()'s checks and the registration of their work (job, stream or batch)
+claimed_sessions: Set[str] = set()
+
+@asynccontextmanager
+async def claim_session(session_id: Optional[str]) -> AsyncIterator[Tuple[str, bool]]:
+    """Yield (session_id, is_new); 403 if the session already generated content or is generating.
+
+    The session stays claimed until the block exits, so the block must
+    register its work (queue the job, start the stream) before leaving;
+    a concurrent request of the same session gets the 403 in the meantime,
+    even while the content lookup below is awaited.
+    """
     # Create session if not exists
     if not session_id:
-    # if True:
-        session_id = str(uuid.uuid4())
-        response.set_cookie(
-            key="session_id",
-            value=session_id,
-            httponly=True,
-            samesite="Lax",
-            secure=True
-        )
+        yield str(uuid.uuid4()), True
+        return
+    # 🔒 Block further requests for this session (including one still in the queue)
+    if session_id in claimed_sessions or job_queue.has_pending(session_id) or session_id in streaming_runs:
+        raise HTTPException(status_code=403, detail="You can only generate content once per session")
+    claimed_sessions.add(session_id)
+    try:
+        if await adb.session_has_content(session_id):
+            raise HTTPException(status_code=403, detail="You can only generate content once per session")
+        yield session_id, False
+    finally:
+        claimed_sessions.discard(session_id)
+
+def client_address(http_request: Request) -> Optional[str]:
+    forwarded = http_request.headers.get("x-forwarded-for") if TRUST_FORWARDED_FOR else None
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return http_request.client.host if http_request.client else None
+
+async def admit(http_request: Request, session_id: Optional[str], cost: int = 1):
+    """429 with Retry-After when the session, client or global token bucket is out of tokens"""
+    if not rate_limiter.enabled:
+        return
+    keys = {"session": session_id, "client": client_address(http_request)}
+    if rate_limiter.store.blocking:
+        rejected = await anyio.to_thread.run_sync(rate_limiter.check, keys, cost)
     else:
-        # 🔒 Block further requests for this session
-        existing_content = db.get_session_content(session_id)
-        if existing_content:
+        rejected = rate_limiter.check(keys, cost)
+    if rejected:
+        scope, wait = rejected
+        RATE_LIMITED_TOTAL.inc(scope=scope)
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded ({scope}), try again shortly",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+def set_session_cookie(response: Response, session_id: str):
+    response.set_cookie(
+        key="session_id",
+        value=session_id,
+        httponly=True,
+        samesite="Lax",
+        secure=True
+    )
+
+@app.post("/generate", status_code=202, response_model=JobResponse)
+async def generate_content(
+    request: ContentRequest, http_request: Request, response: Response, session_id: Optional[str] = Cookie(None)
+):
+    async with claim_session(session_id) as (session_id, is_new):
+        # Charged once the session may generate, so a 403 costs no tokens
+        await admit(http_request, None if is_new else session_id)
+        try:
+            # Polling /jobs/{id} keeps the job alive; a client that stopped polling has gone away
+            job = job_queue.submit(session_id, request, request.cancel_token(idle_timeout=JOB_ABANDON_AFTER))
+        except QueueFullError:
             raise HTTPException(
-                status_code=403,
-                detail="You can only generate content once per session"
+                status_code=429,
+                detail="Too many generation requests in flight, try again shortly",
+                headers={"Retry-After": "30"},
             )
+    if is_new:
+        set_session_cookie(response, session_id)
 
-    job_id = str(uuid.uuid4())
-    result = await content_service.generate_content(request)
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job_response(job)
 
-    content_data = {
-        "id": job_id,
-        "topic": request.topic,
-        "content": result["content"],
-        "citations": result["citations"],
-        "generated_at": datetime.now(),
-        "metadata": {
-            "content_type": request.content_type,
-            "word_count": request.word_count,
-            "actual_words": len(re.findall(r'\w+', result["content"])),
-            "total_citations": len(result["citations"]),
-        },
+# Streaming runs by session; a run is cancelled when its client disconnects
+streaming_runs: Dict[str, asyncio.Task] = {}
+
+@app.post("/generate/stream")
+async def generate_content_stream(
+    request: ContentRequest, http_request: Request, session_id: Optional[str] = Cookie(None)
+):
+    """Server-Sent Events: stage transitions, research output, writer tokens, then the saved record"""
+    async with claim_session(session_id) as (session_id, is_new):
+        await admit(http_request, None if is_new else session_id)
+        progress = ProgressChannel()
+        content_id = str(uuid.uuid4())
+        cancel = request.cancel_token()
+
+        async def produce():
+            current_cancel.set(cancel)
+            try:
+                result, cache_source = await generate_cached(request, progress)
+                content_data = build_content_data(content_id, request, result, cache_source)
+                await save_generated(session_id, [content_data])
+                progress.emit("done", **ContentResponse(**content_data).model_dump(mode="json"))
+            except Cancelled as e:
+                progress.emit("error", detail=str(e))
+            except Exception as e:
+                progress.emit("error", detail=getattr(e, "detail", None) or "Content generation failed")
+            finally:
+                progress.close()
+
+        streaming_runs[session_id] = asyncio.create_task(produce())
+        streaming_runs[session_id].add_done_callback(lambda _: streaming_runs.pop(session_id, None))
+
+    async def events():
+        finished = False
+        try:
+            yield sse_frame("accepted", {"id": content_id})
+            async for frame in progress:
+                yield frame
+            finished = True
+        finally:
+            # Starlette stops iterating when the client disconnects; stop the crew too
+            if not finished:
+                cancel.cancel("disconnected")
+
+    response = StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    if is_new:
+        set_session_cookie(response, session_id)
+    return response
+
+@app.post("/generate/batch", response_model=BatchResponse)
+async def generate_content_batch(
+    batch: BatchContentRequest, http_request: Request, response: Response, session_id: Optional[str] = Cookie(None)
+):
+    """Generate many topics at once: identical requests run once, distinct ones as jobs on the generation queue"""
+    async with claim_session(session_id) as (session_id, is_new):
+        # First occurrence of each normalized request does the work, later ones point at it
+        first_index: Dict[str, int] = {}
+        duplicate_of: Dict[int, int] = {}
+        for index, item in enumerate(batch.items):
+            key = request_key(item.topic, item.content_type, item.word_count)
+            if key in first_index:
+                duplicate_of[index] = first_index[key]
+            else:
+                first_index[key] = index
+
+        # Same backpressure as /generate: the whole batch is queued or none of it
+        if len(first_index) > job_queue.max_size:
+            raise HTTPException(
+                status_code=413,
+                detail=f"A batch may have at most {job_queue.max_size} distinct items, this one has {len(first_index)}",
+            )
+        if len(first_index) > job_queue.room():
+            raise HTTPException(
+                status_code=429,
+                detail="Too many generation requests in flight, try again shortly",
+                headers={"Retry-After": "30"},
+            )
+        await admit(http_request, None if is_new else session_id, cost=len(batch.items))
+        if is_new:
+            set_session_cookie(response, session_id)
+
+        # Deadlines run from now, so time spent in the queue counts
+        jobs = {
+            index: job_queue.submit(session_id, batch.items[index], batch.items[index].cancel_token(), handler=generate_job)
+            for index in first_index.values()
+        }
+        # The session stays claimed until the results are saved
+        watcher = asyncio.create_task(cancel_on_disconnect(http_request, list(jobs.values())))
+        try:
+            for job in jobs.values():
+                await job_queue.wait(job)
+            generated = [job for job in jobs.values() if job.state == JobState.SUCCEEDED]
+            try:
+                await save_generated(session_id, [job.result for job in generated])
+            except HTTPException as e:
+                # One transaction: nothing was saved, so no item succeeded (GET /jobs/{id} says so too)
+                for job in generated:
+                    job.state, job.result, job.error = JobState.FAILED, None, e.detail
+        finally:
+            watcher.cancel()
+
+    by_index = {
+        index: BatchItemResult(index=index, status="succeeded", id=job.id, result=job.result)
+        if job.state == JobState.SUCCEEDED
+        else BatchItemResult(index=index, status="failed", error=job.error)
+        for index, job in jobs.items()
     }
 
-    db.save_content(session_id, content_data)
-    return ContentResponse(**content_data)
+    items = []
+    for index in range(len(batch.items)):
+        if index in by_index:
+            items.append(by_index[index])
+            continue
+        original = by_index[duplicate_of[index]]
+        items.append(BatchItemResult(
+            index=index,
+            status="duplicate" if original.status == "succeeded" else "failed",
+            id=original.id,
+            duplicate_of=original.index,
+            error=original.error,
+        ))
+
+    succeeded = sum(1 for item in items if item.status != "failed")
+    return BatchResponse(total=len(items), succeeded=succeeded, failed=len(items) - succeeded, items=items)
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job.cancel.touch()
+    return job_response(job)
+
+@app.delete("/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str, session_id: Optional[str] = Cookie(None)):
+    """Stop a queued or running job; only the session that submitted it may cancel it"""
+    job = job_queue.get(job_id)
+    if not job or job.session_id != session_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.done:
+        job_queue.cancel(job)
+    return job_response(job)
 
 # 🔥 Get all content with pagination (no session filter)
 @app.get("/all-content")
 async def get_all_content(
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; overrides skip"),
 ):
-    all_content = db.get_all_content()
-    total = len(all_content)
-    paginated = all_content[skip: skip + limit]
+    try:
+        page, next_cursor = await adb.get_content_page(skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
+        "total": await adb.count_content(),
+        "skip": skip,
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "content": page,
+    }
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 prescribes for If-None-Match
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+@app.get("/content/{content_id}", response_model=ContentResponse)
+async def get_content(content_id: str, http_request: Request):
+    """One article; repeat reads come from the hot cache and revalidate to 304 via ETag"""
+    cached = content_hot_cache.get(content_id)
+    if cached is None:
+        item = await adb.get_content(content_id)
+        if not item:
+            raise HTTPException(status_code=404, detail="Content not found")
+        cached = cache_content(item)
+    etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": CONTENT_CACHE_CONTROL}
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/search")
+async def search_content(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+):
+    results, total = await adb.search(q, skip=skip, limit=limit)
+    return {
+        "query": q,
+        # Results are incomplete while older content is still being indexed
+        "indexing": search_index_state["stage"] != "ready",
         "total": total,
         "skip": skip,
         "limit": limit,
-        "content": paginated,
+        "results": results,
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    stats = job_queue.stats()
+    metrics.JOBS.set(stats["queued"], state="queued")
+    metrics.JOBS.set(stats["running"], state="running")
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "timestamp": datetime.now()}
+    return {
+        "status": "ok",
+        "timestamp": datetime.now(),
+        "boot": boot_state,
+        "search_index": search_index_state,
+        "jobs": job_queue.stats(),
+        "result_cache": result_cache.stats(),
+        "content_cache": content_hot_cache.stats(),
+        "search_cache": content_service.search_tool.stats() if content_service else None,
+        "crew_pool": content_service.crew_pool.stats() if content_service else None,
+        # Circuit state, call and hedge counts and p95 latency per LLM model and search
+        "dependencies": resilience.snapshot(),
+    }
+
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """200 once generation is ready (crewai loaded, crew pool warmed), 503 until then"""
+    ready = boot_state["stage"] == "ready"
+    if not ready:
+        response.status_code = 503
+    return {"ready": ready, **boot_state}
 
 if __name__ == "__main__":
     import uvicorn
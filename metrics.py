@@ -0,0 +1,224 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans fast DB queries up to multi-minute crew runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+        return "{" + body + "}"
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._format_labels(k)} {v}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._format_labels(k)} {v}" for k, v in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the wall-clock duration of the `with` block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{self._format_labels(key)} {total[0]}")
+                lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# -------------------- APPLICATION METRICS --------------------
+QUEUE_WAIT_SECONDS = Histogram(
+    "generation_queue_wait_seconds", "Time a generation job waited in the queue before a worker took it"
+)
+STAGE_SECONDS = Histogram(
+    "generation_stage_seconds",
+    "Duration of each generation stage (crew_construction, crew_checkout, research, compaction, writing, citation_extraction, total)",
+    ["stage"],
+)
+RESEARCH_TOKENS = Histogram(
+    "research_context_tokens",
+    "Tokens of research handed to the writer, before (raw) and after (compacted) compaction",
+    ["stage"],
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+GENERATIONS_TOTAL = Counter(
+    "generations_total", "Generation requests by result cache outcome (hit, miss, coalesced) or failure", ["outcome"]
+)
+SIMILAR_REUSE_TOTAL = Counter(
+    "similar_reuse_total", "Generations answered with a stored article on a near-duplicate topic"
+)
+RESEARCH_REUSE_TOTAL = Counter(
+    "research_reuse_total", "Generations that skipped the research stage by reusing stored research"
+)
+RATE_LIMITED_TOTAL = Counter("rate_limited_total", "Requests rejected by admission control", ["scope"])
+GENERATIONS_CANCELLED_TOTAL = Counter(
+    "generations_cancelled_total",
+    "Generations stopped early, by reason (deadline, abandoned, disconnected, cancelled) and stage (queued, running)",
+    ["reason", "stage"],
+)
+CANCELLED_WORK_SECONDS = Counter(
+    "cancelled_work_seconds_total", "Crew thread time spent on generations that were then cancelled", ["reason"]
+)
+JOBS = Gauge("generation_jobs", "Generation jobs currently queued or running", ["state"])
+SEARCH_SECONDS = Histogram("search_call_seconds", "Latency of web search backend calls", ["status"])
+SEARCH_REQUESTS_TOTAL = Counter("search_requests_total", "Web search requests by source (cache, backend)", ["source"])
+LLM_CALL_SECONDS = Histogram("llm_call_seconds", "Latency of LLM completion calls", ["model", "status"])
+LLM_TOKENS_TOTAL = Counter("llm_tokens_total", "LLM tokens consumed", ["model", "kind"])
+LLM_FALLBACKS_TOTAL = Counter(
+    "llm_fallbacks_total", "LLM calls retried on the next model of the stage's chain", ["stage", "model", "reason"]
+)
+DEPENDENCY_RETRIES_TOTAL = Counter(
+    "dependency_retries_total", "Calls to an LLM or search retried after a transient error", ["dependency", "reason"]
+)
+DEPENDENCY_HEDGES_TOTAL = Counter(
+    "dependency_hedges_total", "Duplicate calls sent after the p95 latency (launched) and those answering first (won)",
+    ["dependency", "outcome"],
+)
+CIRCUIT_STATE = Gauge("circuit_state", "Circuit breaker state per dependency (0 closed, 1 half-open, 2 open)", ["dependency"])
+CIRCUIT_REJECTIONS_TOTAL = Counter(
+    "circuit_rejections_total", "Calls failed fast because the dependency's circuit was open", ["dependency"]
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds",
+    "Duration of ContentDB queries",
+    ["query"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+def install_litellm_hooks():
+    """Record latency and token usage of every LLM call made through litellm (crewai's client)"""
+    import litellm
+
+    def on_success(kwargs, response, start_time, end_time):
+        model = str(kwargs.get("model", "unknown"))
+        LLM_CALL_SECONDS.observe((end_time - start_time).total_seconds(), model=model, status="ok")
+        usage = getattr(response, "usage", None)
+        if usage:
+            LLM_TOKENS_TOTAL.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, kind="prompt")
+            LLM_TOKENS_TOTAL.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, kind="completion")
+
+    def on_failure(kwargs, response, start_time, end_time):
+        model = str(kwargs.get("model", "unknown"))
+        LLM_CALL_SECONDS.observe((end_time - start_time).total_seconds(), model=model, status="error")
+
+    # Plain functions: crewai only replaces callbacks of its own handler types
+    litellm.success_callback.append(on_success)
+    litellm.failure_callback.append(on_failure)
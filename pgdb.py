@@ -0,0 +1,490 @@
+import asyncio
+import functools
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from cache import TTLCache
+from metrics import DB_QUERY_SECONDS
+from storage import EXCERPT_CHARS, decode_cursor, encode_cursor, make_excerpt, search_tokens
+
+try:
+    import asyncpg
+except ImportError:  # optional; only needed with DATABASE_URL=postgresql://...
+    asyncpg = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS content (
+        id TEXT PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        content TEXT NOT NULL,
+        citations JSONB NOT NULL,
+        generated_at TIMESTAMP NOT NULL,
+        metadata JSONB NOT NULL,
+        excerpt TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        -- Topic matches weigh more than body matches, see search()
+        search TSVECTOR GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', topic), 'A') || setweight(to_tsvector('english', content), 'B')
+        ) STORED
+    );
+    CREATE INDEX IF NOT EXISTS idx_session ON content (session_id);
+    CREATE INDEX IF NOT EXISTS idx_created ON content (created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_search ON content USING GIN (search);
+
+    -- Row count maintained by a trigger so /all-content never scans the table
+    CREATE TABLE IF NOT EXISTS content_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total BIGINT NOT NULL
+    );
+    INSERT INTO content_stats (id, total) SELECT 1, COUNT(*) FROM content ON CONFLICT DO NOTHING;
+    CREATE OR REPLACE FUNCTION content_count() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE content_stats SET total = total + 1 WHERE id = 1;
+        ELSE
+            UPDATE content_stats SET total = total - 1 WHERE id = 1;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+    DROP TRIGGER IF EXISTS content_count ON content;
+    CREATE TRIGGER content_count AFTER INSERT OR DELETE ON content
+        FOR EACH ROW EXECUTE FUNCTION content_count();
+
+    CREATE TABLE IF NOT EXISTS generation_cache (
+        key TEXT PRIMARY KEY,
+        payload TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at DOUBLE PRECISION NOT NULL,
+        last_hit_at DOUBLE PRECISION NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_cache_last_hit ON generation_cache (last_hit_at);
+
+    CREATE TABLE IF NOT EXISTS research (
+        topic_key TEXT PRIMARY KEY,
+        topic TEXT NOT NULL,
+        report TEXT NOT NULL,
+        created_at DOUBLE PRECISION NOT NULL
+    );
+"""
+
+INSERT_CONTENT_SQL = """
+    INSERT INTO content (id, session_id, topic, content, citations, generated_at, metadata, excerpt)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+"""
+
+
+def _timed(fn):
+    """Observe DB_QUERY_SECONDS for an async method, labelled like AsyncContentDB's queries"""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        with DB_QUERY_SECONDS.time(query=fn.__name__):
+            return await fn(*args, **kwargs)
+    return wrapper
+
+
+class PostgresContentDB:
+    """ContentStore on PostgreSQL via an asyncpg connection pool.
+
+    Lets several app nodes share one history and the result/research
+    caches. The once-per-session gate holds across the fleet only for
+    sessions that have saved content: a generation still queued, streaming
+    or in a batch is claimed in the memory of the process running it, so two
+    nodes can each accept one request from the same session while neither
+    has finished. Route a session to one node (sticky sessions) if that
+    matters. The pool is opened and the
+    schema created on first use. Article bodies are stored as plain TEXT:
+    PostgreSQL already compresses large values (TOAST), and full-text search
+    uses a generated tsvector column instead of a separate index table.
+    """
+
+    def __init__(self, dsn: str, pool_size: int = 10, known_sessions: int = 100_000):
+        if asyncpg is None:
+            raise RuntimeError("DATABASE_URL points at PostgreSQL but asyncpg is not installed (pip install asyncpg)")
+        self.dsn = dsn
+        self.pool_size = pool_size
+        # Sessions that have generated content; a session never loses that status
+        self.known_sessions = TTLCache(max_size=known_sessions, ttl=float("inf"))
+        self._pool: Optional["asyncpg.Pool"] = None
+        self._pool_lock = asyncio.Lock()
+
+    async def pool(self) -> "asyncpg.Pool":
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await self._open()
+        return self._pool
+
+    async def _open(self) -> "asyncpg.Pool":
+        async def init(conn):
+            await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+        pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=self.pool_size, init=init)
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                # Nodes starting together create the schema one at a time
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext('content_schema'))")
+                await conn.execute(SCHEMA)
+        logger.info(f"PostgreSQL content store ready (pool of {self.pool_size})")
+        return pool
+
+    @_timed
+    async def save_content(self, session_id: str, content_data: Dict[str, Any]):
+        """Save generated content for a session"""
+        try:
+            async with (await self.pool()).acquire() as conn:
+                await conn.execute(INSERT_CONTENT_SQL, *_content_params(session_id, content_data))
+            self.known_sessions.set(session_id, True)
+            logger.info(f"Content saved: {content_data['id']}")
+        except Exception as e:
+            logger.error(f"Save content failed: {e}")
+
+    @_timed
+    async def save_many(self, session_id: str, items: List[Dict[str, Any]]) -> int:
+        """Save several generated items for a session in one transaction; returns rows saved"""
+        if not items:
+            return 0
+        try:
+            async with (await self.pool()).acquire() as conn:
+                async with conn.transaction():
+                    await conn.executemany(INSERT_CONTENT_SQL, [_content_params(session_id, item) for item in items])
+            self.known_sessions.set(session_id, True)
+            logger.info(f"Content saved: {len(items)} items for session {session_id}")
+            return len(items)
+        except Exception as e:
+            logger.error(f"Save batch failed: {e}")
+            return 0
+
+    async def session_has_content(self, session_id: str) -> bool:
+        if self.known_sessions.get(session_id):
+            return True
+        return await self._session_has_content(session_id)
+
+    @_timed
+    async def _session_has_content(self, session_id: str) -> bool:
+        try:
+            async with (await self.pool()).acquire() as conn:
+                found = await conn.fetchval("SELECT 1 FROM content WHERE session_id = $1 LIMIT 1", session_id)
+        except Exception as e:
+            logger.error(f"Session lookup failed: {e}")
+            return False
+        if found:
+            self.known_sessions.set(session_id, True)
+        return bool(found)
+
+    @_timed
+    async def get_content(self, content_id: str) -> Optional[Dict[str, Any]]:
+        """Get one content item by id (primary-key lookup)"""
+        try:
+            async with (await self.pool()).acquire() as conn:
+                row = await conn.fetchrow("""
+                    SELECT id, topic, content, citations, generated_at, metadata FROM content WHERE id = $1
+                """, content_id)
+        except Exception as e:
+            logger.error(f"Fetch content failed: {e}")
+            return None
+        return dict(row) if row else None
+
+    @_timed
+    async def get_topic_index(self, limit: int = 50_000) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """(id, topic, metadata) of the newest `limit` items, oldest first, for the similarity index"""
+        try:
+            async with (await self.pool()).acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT id, topic, metadata FROM (
+                        SELECT id, topic, metadata, created_at FROM content
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT $1
+                    ) newest ORDER BY created_at, id
+                """, limit)
+        except Exception as e:
+            logger.error(f"Fetch topic index failed: {e}")
+            return []
+        return [(row["id"], row["topic"], row["metadata"]) for row in rows]
+
+    @_timed
+    async def get_session_content(self, session_id: str) -> List[Dict[str, Any]]:
+        """Get all content for a specific session"""
+        try:
+            async with (await self.pool()).acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT id, topic, content, citations, generated_at, metadata FROM content
+                    WHERE session_id = $1
+                    ORDER BY created_at DESC
+                """, session_id)
+        except Exception as e:
+            logger.error(f"Fetch session content failed: {e}")
+            return []
+        return [dict(row) for row in rows]
+
+    @_timed
+    async def get_content_page(
+        self, skip: int = 0, limit: int = 10, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Get one page of content summaries, newest first, plus the cursor for the next page (see ContentDB)"""
+        if cursor:
+            created_at, content_id = decode_cursor(cursor)
+            where, params = "WHERE (created_at, id) < ($1, $2)", [_timestamp(created_at), content_id, limit]
+            paging = "LIMIT $3"
+        else:
+            where, params, paging = "", [limit, skip], "LIMIT $1 OFFSET $2"
+        try:
+            async with (await self.pool()).acquire() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT id, topic, generated_at, metadata,
+                           COALESCE(excerpt, left(content, {EXCERPT_CHARS})) AS excerpt, created_at
+                    FROM content
+                    {where}
+                    ORDER BY created_at DESC, id DESC
+                    {paging}
+                """, *params)
+        except Exception as e:
+            logger.error(f"Fetch content page failed: {e}")
+            return [], None
+
+        next_cursor = encode_cursor(rows[-1]["created_at"].isoformat(), rows[-1]["id"]) if len(rows) == limit else None
+        results = [
+            {
+                "id": row["id"],
+                "topic": row["topic"],
+                "generated_at": row["generated_at"],
+                "metadata": row["metadata"],
+                "excerpt": make_excerpt(row["excerpt"] or ""),
+            }
+            for row in rows
+        ]
+        return results, next_cursor
+
+    @_timed
+    async def count_content(self) -> int:
+        """Total number of stored content rows (O(1), trigger-maintained)"""
+        try:
+            async with (await self.pool()).acquire() as conn:
+                return await conn.fetchval("SELECT total FROM content_stats WHERE id = 1") or 0
+        except Exception as e:
+            logger.error(f"Count content failed: {e}")
+            return 0
+
+    @_timed
+    async def get_cached_result(self, key: str, max_age: float) -> Optional[Dict[str, Any]]:
+        """Return a cached generation younger than `max_age` seconds and mark it as used"""
+        now = time.time()
+        try:
+            async with (await self.pool()).acquire() as conn:
+                payload = await conn.fetchval("""
+                    UPDATE generation_cache SET last_hit_at = $3
+                    WHERE key = $1 AND created_at >= $2
+                    RETURNING payload
+                """, key, now - max_age, now)
+        except Exception as e:
+            logger.error(f"Fetch cached result failed: {e}")
+            return None
+        return json.loads(payload) if payload is not None else None
+
+    @_timed
+    async def put_cached_result(self, key: str, result: Dict[str, Any], max_entries: int, max_bytes: int):
+        """Store a generation, then evict least recently used entries beyond the limits"""
+        payload = json.dumps(result)
+        now = time.time()
+        try:
+            async with (await self.pool()).acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute("""
+                        INSERT INTO generation_cache (key, payload, size, created_at, last_hit_at)
+                        VALUES ($1, $2, $3, $4, $4)
+                        ON CONFLICT (key) DO UPDATE SET
+                            payload = excluded.payload, size = excluded.size,
+                            created_at = excluded.created_at, last_hit_at = excluded.last_hit_at
+                    """, key, payload, len(payload), now)
+                    await conn.execute("""
+                        DELETE FROM generation_cache WHERE key IN (
+                            SELECT key FROM (
+                                SELECT key,
+                                       ROW_NUMBER() OVER (ORDER BY last_hit_at DESC) AS rank,
+                                       SUM(size) OVER (ORDER BY last_hit_at DESC) AS running_size
+                                FROM generation_cache
+                            ) ranked
+                            WHERE rank > $1 OR running_size > $2
+                        )
+                    """, max_entries, max_bytes)
+        except Exception as e:
+            logger.error(f"Save cached result failed: {e}")
+
+    @_timed
+    async def save_research(self, topic_key: str, topic: str, report: str):
+        """Store (or refresh) the research report for a normalized topic"""
+        try:
+            async with (await self.pool()).acquire() as conn:
+                await conn.execute("""
+                    INSERT INTO research (topic_key, topic, report, created_at) VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (topic_key) DO UPDATE SET
+                        topic = excluded.topic, report = excluded.report, created_at = excluded.created_at
+                """, topic_key, topic, report, time.time())
+        except Exception as e:
+            logger.error(f"Save research failed: {e}")
+
+    @_timed
+    async def get_research(self, topic_key: str, max_age: float) -> Optional[Dict[str, Any]]:
+        """Research for a normalized topic if it is younger than `max_age` seconds"""
+        try:
+            async with (await self.pool()).acquire() as conn:
+                row = await conn.fetchrow("""
+                    SELECT topic_key, topic, report, created_at FROM research
+                    WHERE topic_key = $1 AND created_at >= $2
+                """, topic_key, time.time() - max_age)
+        except Exception as e:
+            logger.error(f"Fetch research failed: {e}")
+            return None
+        if row is None:
+            return None
+        return {**dict(row), "created_at": datetime.fromtimestamp(row["created_at"])}
+
+    @_timed
+    async def get_research_index(self, max_age: float, limit: int = 50_000) -> List[Tuple[str, str, float]]:
+        """(topic_key, topic, created_at) of fresh research, oldest first, for the similarity index"""
+        try:
+            async with (await self.pool()).acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT topic_key, topic, created_at FROM (
+                        SELECT topic_key, topic, created_at FROM research
+                        WHERE created_at >= $1
+                        ORDER BY created_at DESC
+                        LIMIT $2
+                    ) fresh ORDER BY created_at
+                """, time.time() - max_age, limit)
+        except Exception as e:
+            logger.error(f"Fetch research index failed: {e}")
+            return []
+        return [tuple(row) for row in rows]
+
+    @_timed
+    async def search(self, query: str, skip: int = 0, limit: int = 10) -> Tuple[List[Dict[str, Any]], int]:
+        """Full-text search over topic and content, best matches first; same shape as ContentDB.search"""
+        match = _tsquery(query)
+        if not match:
+            return [], 0
+        try:
+            async with (await self.pool()).acquire() as conn:
+                total = await conn.fetchval(
+                    "SELECT COUNT(*) FROM content WHERE search @@ to_tsquery('english', $1)", match
+                )
+                # The snippet is an HTML fragment: the body is escaped before <mark> goes in
+                rows = await conn.fetch("""
+                    SELECT id, topic, generated_at, metadata,
+                           ts_headline('english', replace(replace(replace(content, '&', '&amp;'), '<', '&lt;'), '>', '&gt;'), q,
+                                       'StartSel=<mark>, StopSel=</mark>, MaxWords=24, MinWords=12, MaxFragments=1')
+                               AS snippet,
+                           ts_rank('{0.1, 0.2, 0.5, 1.0}', search, q) AS score
+                    FROM content, to_tsquery('english', $1) AS q
+                    WHERE search @@ q
+                    ORDER BY score DESC
+                    LIMIT $2 OFFSET $3
+                """, match, limit, skip)
+        except Exception as e:
+            logger.error(f"Search failed: {e}")
+            return [], 0
+        return [dict(row) for row in rows], total
+
+    async def ensure_search_index(self) -> int:
+        """Nothing to backfill: the tsvector column is generated by PostgreSQL"""
+        return 0
+
+    @_timed
+    async def export_content(
+        self, cursor: Optional[str] = None, limit: int = 500
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Full rows, oldest first, with session_id and created_at, for copying to another store"""
+        where, params = "", [limit]
+        if cursor:
+            created_at, content_id = decode_cursor(cursor)
+            where, params = "WHERE (created_at, id) > ($2, $3)", [limit, _timestamp(created_at), content_id]
+        async with (await self.pool()).acquire() as conn:
+            rows = await conn.fetch(f"""
+                SELECT id, session_id, topic, content, citations, generated_at, metadata, created_at
+                FROM content
+                {where}
+                ORDER BY created_at, id
+                LIMIT $1
+            """, *params)
+        next_cursor = encode_cursor(rows[-1]["created_at"].isoformat(), rows[-1]["id"]) if len(rows) == limit else None
+        return [dict(row) for row in rows], next_cursor
+
+    @_timed
+    async def import_content(self, rows: List[Dict[str, Any]]) -> int:
+        """Insert exported rows keeping their ids, sessions and timestamps; existing ids are skipped"""
+        if not rows:
+            return 0
+        async with (await self.pool()).acquire() as conn:
+            async with conn.transaction():
+                inserted = await conn.fetch("""
+                    INSERT INTO content
+                        (id, session_id, topic, content, citations, generated_at, metadata, excerpt, created_at)
+                    SELECT * FROM unnest(
+                        $1::text[], $2::text[], $3::text[], $4::text[], $5::jsonb[],
+                        $6::timestamp[], $7::jsonb[], $8::text[], $9::timestamptz[]
+                    )
+                    ON CONFLICT (id) DO NOTHING
+                    RETURNING session_id
+                """, *zip(*(
+                    (*_content_params(row["session_id"], row), row["created_at"]) for row in rows
+                )))
+        for row in inserted:
+            self.known_sessions.set(row["session_id"], True)
+        return len(inserted)
+
+    @_timed
+    async def export_research(self) -> List[Tuple[str, str, str, float]]:
+        async with (await self.pool()).acquire() as conn:
+            rows = await conn.fetch("SELECT topic_key, topic, report, created_at FROM research ORDER BY created_at")
+        return [tuple(row) for row in rows]
+
+    @_timed
+    async def import_research(self, rows: List[Tuple[str, str, str, float]]) -> int:
+        """Insert research reports, keeping the newer one when a topic already exists"""
+        if not rows:
+            return 0
+        async with (await self.pool()).acquire() as conn:
+            await conn.executemany("""
+                INSERT INTO research (topic_key, topic, report, created_at) VALUES ($1, $2, $3, $4)
+                ON CONFLICT (topic_key) DO UPDATE SET
+                    topic = excluded.topic, report = excluded.report, created_at = excluded.created_at
+                WHERE excluded.created_at > research.created_at
+            """, rows)
+        return len(rows)
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+def _content_params(session_id: str, content_data: Dict[str, Any]) -> Tuple:
+    return (
+        content_data["id"],
+        session_id,
+        content_data["topic"],
+        content_data["content"],
+        content_data["citations"],
+        content_data["generated_at"],
+        content_data["metadata"],
+        make_excerpt(content_data["content"]),
+    )
+
+
+def _timestamp(value: str) -> datetime:
+    """Cursor timestamp as an aware datetime (SQLite cursors carry naive UTC strings)"""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _tsquery(query: str) -> str:
+    """Free text as a safe to_tsquery() argument: all words must match, the last as a prefix"""
+    tokens = search_tokens(query)
+    if not tokens:
+        return ""
+    return " & ".join(tokens[:-1] + [tokens[-1] + ":*"])
@@ -0,0 +1,84 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Generic, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no pooled object is returned within the checkout timeout"""
+
+
+class ObjectPool(Generic[T]):
+    """Fixed-size pool of expensive, non-thread-safe objects (e.g. crews).
+
+    Objects are built by `factory` either up front with `warm_up` or lazily
+    on first demand, never more than `size` in total. A checked-out object is
+    used by exactly one thread until it is returned.
+    """
+
+    def __init__(self, factory: Callable[[], T], size: int, name: str = "pool"):
+        self.factory = factory
+        self.size = size
+        self.name = name
+        self._idle: "queue.LifoQueue[T]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """Build every object now so the first requests don't pay for it"""
+        while self._reserve():
+            try:
+                obj = self._build()
+            except Exception as e:
+                # Requests will retry the build lazily on checkout
+                logger.error(f"{self.name}: warm-up failed: {e}")
+                return
+            self._idle.put(obj)
+        logger.info(f"{self.name}: {self.size} objects ready")
+
+    def acquire(self, timeout: float = 300) -> T:
+        """Take an idle object, building one if the pool isn't full yet; pair with `release`"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        if self._reserve():
+            return self._build()
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolExhaustedError(f"{self.name}: no object free after {timeout}s")
+
+    def release(self, obj: T):
+        self._idle.put(obj)
+
+    @contextmanager
+    def checkout(self, timeout: float = 300) -> Iterator[T]:
+        obj = self.acquire(timeout)
+        try:
+            yield obj
+        finally:
+            self.release(obj)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": self.size, "created": self._created, "idle": self._idle.qsize()}
+
+    def _reserve(self) -> bool:
+        with self._lock:
+            if self._created >= self.size:
+                return False
+            self._created += 1
+            return True
+
+    def _build(self) -> T:
+        try:
+            return self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import logging
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Set inside the crew thread so event-bus callbacks know which request they belong to
+current_progress: ContextVar[Optional["ProgressChannel"]] = ContextVar("current_progress", default=None)
+
+_CLOSED = object()
+
+
+class ProgressChannel:
+    """Carries progress events from a crew thread to an async SSE consumer.
+
+    `emit` is safe to call from any thread; events are queued on the event
+    loop that created the channel and read back with `async for`.
+    """
+
+    def __init__(self, heartbeat: float = 15.0):
+        self.loop = asyncio.get_running_loop()
+        self.heartbeat = heartbeat
+        self.stage: Optional[str] = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(self, event: str, **data: Any):
+        if event.endswith("_started"):
+            self.stage = event[: -len("_started")]
+        self.loop.call_soon_threadsafe(self._queue.put_nowait, (event, data))
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self._queue.put_nowait, _CLOSED)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        """Yield Server-Sent Events frames until the channel is closed"""
+        while True:
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=self.heartbeat)
+            except asyncio.TimeoutError:
+                # Comment frame keeps proxies from timing out during long stages
+                yield ": keep-alive\n\n"
+                continue
+            if item is _CLOSED:
+                return
+            event, data = item
+            yield sse_frame(event, data)
+
+
+def sse_frame(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def install_stream_forwarding():
+    """Forward streamed writer tokens from crewai's event bus to the request's channel.
+
+    Called once crewai is loaded (see service.py) so importing this module stays cheap.
+    """
+    try:
+        from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+    except ImportError:  # older crewai releases keep the event bus under utilities
+        from crewai.utilities.events import crewai_event_bus
+        from crewai.utilities.events.llm_events import LLMStreamChunkEvent
+
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def _forward_writer_tokens(source, event):
+        progress = current_progress.get()
+        if progress is not None and progress.stage == "writing":
+            progress.emit("token", text=event.chunk)
@@ -0,0 +1,167 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Rule:
+    """`burst` tokens, refilled continuously at `burst / period` per second"""
+    burst: float
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.burst / self.period
+
+    @classmethod
+    def parse(cls, spec: str) -> Optional["Rule"]:
+        """'10/60' -> 10 requests per 60 s with bursts of 10; '' or 'off' -> None"""
+        spec = spec.strip().lower()
+        if spec in ("", "off", "0"):
+            return None
+        burst, _, period = spec.partition("/")
+        return cls(float(burst), float(period or 1))
+
+
+# (bucket key, rule, cost)
+Take = Tuple[str, Rule, float]
+
+
+def _refill(tokens: float, updated: float, now: float, rule: Rule) -> float:
+    return min(rule.burst, tokens + max(0.0, now - updated) * rule.rate)
+
+
+def _longest_wait(levels: List[float], takes: List[Take]) -> Tuple[float, Optional[str]]:
+    """(seconds until every bucket can pay, key of the bucket that takes longest); (0, None) if all can"""
+    wait, key = 0.0, None
+    for tokens, (bucket, rule, cost) in zip(levels, takes):
+        needed = (cost - tokens) / rule.rate
+        if needed > wait:
+            wait, key = needed, bucket
+    return wait, key
+
+
+class MemoryBucketStore:
+    """Token buckets of this process; the least recently used keys beyond `max_keys` are dropped"""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, takes: List[Take]) -> Tuple[float, Optional[str]]:
+        """Pay from every bucket if all have enough tokens; else pay nothing and return the wait and binding key"""
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            for bucket, rule, _ in takes:
+                tokens, updated = self._buckets.get(bucket, (rule.burst, now))
+                levels.append(_refill(tokens, updated, now, rule))
+            wait, key = _longest_wait(levels, takes)
+            if wait == 0:
+                for tokens, (bucket, _, cost) in zip(levels, takes):
+                    self._buckets[bucket] = (tokens - cost, now)
+                    self._buckets.move_to_end(bucket)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            return wait, key
+
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file shared by every uvicorn worker on the host.
+
+    Each admission is one IMMEDIATE transaction, so concurrent workers see a
+    consistent bucket; wall-clock time is used since processes don't share
+    a monotonic clock.
+    """
+
+    blocking = True
+
+    def __init__(self, db_path: str = "ratelimit.db", idle_ttl: float = 3600):
+        self.db_path = db_path
+        self.idle_ttl = idle_ttl
+        self._local = threading.local()
+        self._takes = 0
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, takes: List[Take]) -> Tuple[float, Optional[str]]:
+        now = time.time()
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = []
+            for bucket, rule, _ in takes:
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (bucket,)).fetchone()
+                tokens, updated = row if row else (rule.burst, now)
+                levels.append(_refill(tokens, updated, now, rule))
+            wait, key = _longest_wait(levels, takes)
+            if wait == 0:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                    [(bucket, tokens - cost, now) for tokens, (bucket, _, cost) in zip(levels, takes)],
+                )
+            self._takes += 1
+            if self._takes % 1000 == 0:
+                # Idle buckets are full again; forgetting them changes nothing
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.idle_ttl,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait, key
+
+
+class RateLimiter:
+    """Admission control over per-session, per-client and global token buckets.
+
+    A request is admitted only if every applicable bucket can pay its cost,
+    and then pays all of them at once, so a rejection never drains the
+    buckets that did have room. A cost above a bucket's burst is capped at
+    the burst (a large batch waits for a full bucket instead of never fitting).
+    """
+
+    def __init__(self, store, rules: Dict[str, Optional[Rule]]):
+        self.store = store
+        self.rules = {scope: rule for scope, rule in rules.items() if rule}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rules)
+
+    def check(self, keys: Dict[str, Optional[str]], cost: float = 1) -> Optional[Tuple[str, float]]:
+        """None if admitted, else (scope of the tightest bucket, seconds until it would admit)"""
+        takes = [
+            (f"{scope}:{keys.get(scope) or ''}", rule, min(cost, rule.burst))
+            for scope, rule in self.rules.items()
+            if scope == "global" or keys.get(scope)
+        ]
+        if not takes:
+            return None
+        wait, key = self.store.take(takes)
+        if wait == 0:
+            return None
+        return key.split(":", 1)[0], wait
@@ -0,0 +1,83 @@
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from citations import REFERENCE_ENTRY, REFERENCES_HEADING, URL
+
+# Sub-queries for the parallel research mode, one per bullet of the research brief
+RESEARCH_ANGLES: Dict[str, str] = {
+    "news": "Latest news, trends, and industry developments",
+    "statistics": "Key facts, statistics, and data points",
+    "experts": "Expert insights and opinions",
+    "examples": "Practical applications and real-world examples",
+}
+
+# An in-text marker with the blanks before it, which go too when the marker is dropped
+_REF = re.compile(r"([ \t]*)\[(\d+)\]")
+
+
+def split_report(report: str) -> Tuple[str, Dict[int, str]]:
+    """Split a research report into its findings text and {number: entry} bibliography"""
+    lines = report.splitlines()
+    for i, line in enumerate(lines):
+        if REFERENCES_HEADING.match(line):
+            body, tail = lines[:i], lines[i + 1:]
+            break
+    else:
+        return report.strip(), {}
+
+    entries: Dict[int, str] = {}
+    for line in tail:
+        match = REFERENCE_ENTRY.match(line)
+        if match:
+            entries.setdefault(int(match.group(1)), match.group(2))
+    return "\n".join(body).strip(), entries
+
+
+def source_key(entry: str) -> str:
+    """Identity of a bibliography entry: its normalized URL, else its folded text"""
+    match = URL.search(entry)
+    if not match:
+        return " ".join(entry.casefold().split())
+    parts = urlsplit(match.group(0).rstrip(".,;"))
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower().removeprefix("www."), path, parts.query, ""))
+
+
+def merge_research(reports: Dict[str, Optional[str]]) -> str:
+    """Combine sub-reports into one, de-duplicating sources by URL.
+
+    Each report's bibliography is renumbered into one shared list and the
+    in-text [n] markers of its findings are rewritten to match, so the
+    writer sees a single consistent set of citation numbers. A marker
+    with no entry in its report's bibliography is dropped: left as is, it
+    would point at whichever merged source now has that number.
+    """
+    numbers: Dict[str, int] = {}
+    bibliography: List[str] = []
+    sections: List[str] = []
+
+    for angle, report in reports.items():
+        if not report:
+            continue
+        body, entries = split_report(report)
+        remap: Dict[int, int] = {}
+        for local, entry in sorted(entries.items()):
+            key = source_key(entry)
+            if key not in numbers:
+                bibliography.append(entry)
+                numbers[key] = len(bibliography)
+            remap[local] = numbers[key]
+
+        body = _REF.sub(lambda m: _renumber(m, remap), body)
+        title = RESEARCH_ANGLES.get(angle, angle)
+        sections.append(f"## {title}\n\n{body}")
+
+    if bibliography:
+        sections.append("## Bibliography\n\n" + "\n".join(f"[{n}] {entry}" for n, entry in enumerate(bibliography, 1)))
+    return "\n\n".join(sections)
+
+
+def _renumber(match: "re.Match[str]", remap: Dict[int, int]) -> str:
+    number = remap.get(int(match.group(2)))
+    return "" if number is None else f"{match.group(1)}[{number}]"
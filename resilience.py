@@ -0,0 +1,250 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from cancellation import checkpoint, current_cancel
+from metrics import CIRCUIT_REJECTIONS_TOTAL, CIRCUIT_STATE, DEPENDENCY_HEDGES_TOTAL, DEPENDENCY_RETRIES_TOTAL
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Exception class names (anywhere in the MRO) of transient network and server failures
+TRANSIENT_ERRORS = frozenset({
+    "TimeoutError",
+    "ConnectionError",
+    "Timeout",
+    "ReadTimeout",
+    "ConnectTimeout",
+    "URLError",
+    "RemoteDisconnected",
+    "APITimeoutError",
+    "APIConnectionError",
+    "RateLimitError",
+    "ServiceUnavailableError",
+    "InternalServerError",
+})
+
+# Registry for /health: every Dependency by name
+DEPENDENCIES: Dict[str, "Dependency"] = {}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open"""
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Worth retrying: timeouts, dropped connections, 408, 429 and 5xx answers"""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(error, "code", None) or getattr(response, "status_code", None)
+    if isinstance(status, int):
+        # The server answered (urllib's HTTPError is also a URLError): its status decides
+        return status in (408, 429) or status >= 500
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Up to `attempts` calls, waiting a random 0..min(max_delay, base_delay * 2**n) s before retry n ("full jitter")"""
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def delay(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+class CircuitBreaker:
+    """Fails fast after `failures` consecutive transient errors.
+
+    Open for `reset_after` seconds, then half-open: one probe call is let
+    through; its success closes the circuit, its failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failures: int = 5, reset_after: float = 30.0):
+        self.name = name
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(0, dependency=name)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_after:
+                self._set(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+                self._set(self.CLOSED)
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self._consecutive >= self.failures):
+                logger.warning(f"Circuit {self.name} opened after {self._consecutive} consecutive failures")
+                self._opened_at = time.monotonic()
+                self._set(self.OPEN)
+
+    def _set(self, state: str):
+        self.state = state
+        CIRCUIT_STATE.set((self.CLOSED, self.HALF_OPEN, self.OPEN).index(state), dependency=self.name)
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies"""
+
+    def __init__(self, window: int = 200):
+        self._samples: "deque[float]" = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        """The q-quantile (0..1) of the window, None until `min_samples` calls were seen"""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Dependency:
+    """Retry, hedging and circuit breaking around the blocking calls to one remote dependency.
+
+    `call(fn)` runs `fn` with up to `retry.attempts` tries on errors for which
+    `retryable` holds, sleeping with jittered exponential backoff in between
+    (never past the generation's deadline, see cancellation.py). With a
+    `hedge_budget`, a call still running after the dependency's p95 latency
+    gets one duplicate and the first success wins; at most that fraction of
+    calls is hedged, so a slow dependency doesn't get twice the load. The
+    losing duplicate runs to completion in the background.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        retryable: Callable[[BaseException], bool] = is_transient_error,
+        retry: RetryPolicy = RetryPolicy(),
+        breaker: Optional[CircuitBreaker] = None,
+        hedge_budget: float = 0.0,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.05,
+        hedge_workers: int = 32,
+    ):
+        self.name = name
+        self.retryable = retryable
+        self.retry = retry
+        self.breaker = breaker or CircuitBreaker(name)
+        self.hedge_budget = hedge_budget
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self._hedge_pool = (
+            ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix=f"hedge-{name}") if hedge_budget > 0 else None
+        )
+        self._lock = threading.Lock()
+        DEPENDENCIES[name] = self
+
+    def call(self, fn: Callable[[], T], hedge: bool = True) -> T:
+        """`hedge=False` for calls with side effects (streamed tokens, executed tools)"""
+        for attempt in range(self.retry.attempts):
+            checkpoint()
+            if not self.breaker.allow():
+                CIRCUIT_REJECTIONS_TOTAL.inc(dependency=self.name)
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+            try:
+                result = self._hedged(fn) if hedge and self._hedge_pool else self._timed(fn)
+            except Exception as e:
+                if not self.retryable(e):
+                    # The dependency answered; the request itself was bad
+                    self.breaker.success()
+                    raise
+                self.breaker.failure()
+                delay = self.retry.delay(attempt)
+                last = attempt == self.retry.attempts - 1
+                if last or self.breaker.state == CircuitBreaker.OPEN or not self._time_left(delay):
+                    raise
+                logger.warning(f"{self.name} failed ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+                DEPENDENCY_RETRIES_TOTAL.inc(dependency=self.name, reason=type(e).__name__)
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+            else:
+                self.breaker.success()
+                return result
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latency.percentile(self.hedge_quantile)
+        return {"circuit": self.breaker.state, "calls": self.calls, "retries": self.retries, "hedges": self.hedges, "p95": p95}
+
+    def _time_left(self, delay: float) -> bool:
+        token = current_cancel.get()
+        remaining = token.remaining() if token else None
+        return remaining is None or remaining > delay
+
+    def _timed(self, fn: Callable[[], T]) -> T:
+        with self._lock:
+            self.calls += 1
+        start = time.perf_counter()
+        result = fn()
+        self.latency.observe(time.perf_counter() - start)
+        return result
+
+    def _hedged(self, fn: Callable[[], T]) -> T:
+        delay = self.latency.percentile(self.hedge_quantile)
+        if delay is None:
+            return self._timed(fn)
+        # Both copies see this thread's context (request, progress, cancellation)
+        primary = self._hedge_pool.submit(contextvars.copy_context().run, self._timed, fn)
+        done, _ = wait([primary], timeout=max(delay, self.hedge_min_delay))
+        with self._lock:
+            allowed = not done and self.hedges < self.hedge_budget * self.calls
+            if allowed:
+                self.hedges += 1
+        if not allowed:
+            return primary.result()
+
+        DEPENDENCY_HEDGES_TOTAL.inc(dependency=self.name, outcome="launched")
+        hedge = self._hedge_pool.submit(contextvars.copy_context().run, self._timed, fn)
+        pending, error = {primary, hedge}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        DEPENDENCY_HEDGES_TOTAL.inc(dependency=self.name, outcome="won")
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return {name: dependency.stats() for name, dependency in list(DEPENDENCIES.items())}
@@ -0,0 +1,345 @@
+"""Generation service: crewai agents, LLMs and the web search tool.
+
+Importing this module loads crewai, crewai_tools and litellm, which takes
+seconds; mainv2 imports it in the background after the app is serving.
+"""
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+import anyio
+from crewai import Agent, Task, Crew, Process
+from crewai_tools import SerperDevTool
+from fastapi import HTTPException
+
+import citations
+import metrics
+from cache import TTLCache
+from cancellation import Cancelled, checkpoint, current_cancel
+from compaction import compact_research, token_budget
+from llm import ModelRouter, RoutedLLM, current_request, is_fallback_error, openai_llm, parse_overrides
+from metrics import CANCELLED_WORK_SECONDS, GENERATIONS_CANCELLED_TOTAL, GENERATIONS_TOTAL, RESEARCH_TOKENS, STAGE_SECONDS
+from pool import ObjectPool
+from progress import ProgressChannel, current_progress, install_stream_forwarding
+from research import RESEARCH_ANGLES, merge_research
+from resilience import CircuitBreaker, Dependency, RetryPolicy, is_transient_error
+from tools import CachedSearchTool, StubSearchTool
+
+if TYPE_CHECKING:
+    from mainv2 import ContentRequest
+
+logger = logging.getLogger(__name__)
+
+# "single": one researcher covers the whole brief; "parallel": one sub-researcher per angle
+RESEARCH_MODE = os.getenv("RESEARCH_MODE", "single")
+# Research handed to the writer is compacted to word_count * RESEARCH_TOKENS_PER_WORD tokens, within bounds
+RESEARCH_TOKENS_PER_WORD = float(os.getenv("RESEARCH_TOKENS_PER_WORD", "2"))
+RESEARCH_MIN_TOKENS = int(os.getenv("RESEARCH_MIN_TOKENS", "800"))
+RESEARCH_MAX_TOKENS = int(os.getenv("RESEARCH_MAX_TOKENS", "6000"))
+
+# -------------------- LLM & TOOLS --------------------
+# Transient failures are retried with jittered backoff; calls slower than the dependency's p95 get one
+# duplicate (at most HEDGE_BUDGET of calls); BREAKER_FAILURES consecutive failures open its circuit
+RETRY_POLICY = RetryPolicy(
+    attempts=int(os.getenv("RETRY_ATTEMPTS", "3")),
+    base_delay=float(os.getenv("RETRY_BASE_DELAY", "0.5")),
+    max_delay=float(os.getenv("RETRY_MAX_DELAY", "8")),
+)
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.05"))
+
+
+def guarded(name: str, retryable: Callable[[BaseException], bool]) -> Dependency:
+    return Dependency(
+        name,
+        retryable,
+        retry=RETRY_POLICY,
+        breaker=CircuitBreaker(
+            name,
+            failures=int(os.getenv("BREAKER_FAILURES", "5")),
+            reset_after=float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+        ),
+        hedge_budget=HEDGE_BUDGET,
+    )
+
+
+# Cheaper model for the tool-calling research stage, the writer keeps the quality model;
+# timeouts and rate limits fall through to LLM_FALLBACK_MODELS
+model_router = ModelRouter(
+    openai_llm(os.getenv("OPENAI_API_KEY"), timeout=float(os.getenv("LLM_TIMEOUT", "120"))),
+    research_model=os.getenv("RESEARCH_MODEL", "gpt-4o-mini"),
+    writer_model=os.getenv("WRITER_MODEL", "gpt-3.5-turbo"),
+    fallbacks=[m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "gpt-4o-mini,gpt-3.5-turbo").split(",") if m.strip()],
+    writer_by_type=parse_overrides(os.getenv("WRITER_MODEL_BY_TYPE", "")),
+    long_form_model=os.getenv("LONG_FORM_MODEL") or None,
+    long_form_words=int(os.getenv("LONG_FORM_WORDS", "1500")),
+    guard_factory=lambda model: guarded(f"llm:{model}", is_fallback_error),
+)
+myllm = RoutedLLM(model_router, "research")
+# Streamed so /generate/stream can forward the writer's tokens
+writer_llm = RoutedLLM(model_router, "writing", stream=True)
+# SEARCH_BACKEND=stub swaps Serper for deterministic offline results (tests, benchmarks)
+search_backend = StubSearchTool() if os.getenv("SEARCH_BACKEND") == "stub" else SerperDevTool()
+serper_tool = CachedSearchTool(
+    search_backend,
+    TTLCache(
+        max_size=int(os.getenv("SEARCH_CACHE_SIZE", "2048")),
+        ttl=float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+    ),
+    guard=guarded("search", is_transient_error),
+)
+metrics.install_litellm_hooks()
+install_stream_forwarding()
+
+# -------------------- SERVICE --------------------
+@dataclass
+class CrewSet:
+    """Researcher/writer crews owned by one generation at a time (see crew_pool)"""
+    research_crew: Crew
+    writing_crew: Crew
+    angle_crews: Dict[str, Crew]
+
+    def reset(self):
+        """Forget the failed attempts of the last run before the set goes back to the pool.
+
+        crewai's Agent.execute_task counts every exception (including
+        Cancelled from an LLM call) in `_times_executed` and retries until
+        max_retry_limit; a pooled agent would otherwise carry that count into
+        the next generation and give up on its first error.
+        """
+        for crew in (self.research_crew, self.writing_crew, *self.angle_crews.values()):
+            for agent in crew.agents:
+                agent._times_executed = 0
+
+class ContentService:
+    def __init__(self, limiter: anyio.CapacityLimiter):
+        # Crew runs share the app's thread budget (generation_limiter in mainv2)
+        self.limiter = limiter
+        self.search_tool = serper_tool
+        # One isolated set per concurrent crew run; tasks are templates filled by kickoff(inputs)
+        self.crew_pool = ObjectPool(self.build_crew_set, size=int(limiter.total_tokens), name="crew pool")
+
+    def new_researcher(self) -> Agent:
+        return Agent(
+            role="Senior Research Analyst",
+            goal="Conduct thorough research using credible web sources",
+            backstory="""You are an experienced research analyst who excels at finding 
+            the latest information from web sources, industry news, and reports.""",
+            verbose=True,
+            allow_delegation=False,
+            tools=[self.search_tool],
+            llm=myllm,
+        )
+
+    def new_writer(self) -> Agent:
+        return Agent(
+            role="Expert Content Writer",
+            goal="Create engaging, well-structured content based on research",
+            backstory="""You are a professional content writer who transforms research 
+            into compelling, accessible content.""",
+            verbose=True,
+            allow_delegation=False,
+            llm=writer_llm,
+        )
+
+    def create_research_task(self, agent: Agent) -> Task:
+        # {topic} and {focus} are filled per request by Crew.kickoff(inputs=...)
+        return Task(
+            description="Research the topic: {topic}\n\n"
+            "Use web search to find:\n"
+            "{focus}\n\n"
+            "IMPORTANT: Collect citation info (Title | Author | Date | URL | Web).",
+            expected_output="""A research report with:
+            1. Key findings
+            2. Statistics
+            3. Trends
+            4. Bibliography, one source per line: [n] Title | Author | Date | URL | Web""",
+            agent=agent,
+        )
+
+    def create_writing_task(self, agent: Agent) -> Task:
+        return Task(
+            description="""
+            Create a {content_type} about: {topic}
+            
+            Requirements:
+            - ~{word_count} words
+            - Engaging headline
+            - Structured with subheadings
+            - Clear intro & conclusion
+            - Based on research findings
+            - Use in-text citations [1], [2], etc.
+            - End with a References section, one source per line: [n] Title | Author | Date | URL | Web
+            
+            Research findings:
+            {research}
+            """,
+            expected_output="A polished article with proper citations & references.",
+            agent=agent,
+        )
+
+    def build_crew_set(self) -> CrewSet:
+        with STAGE_SECONDS.time(stage="crew_construction"):
+            def single_task_crew(agent: Agent, task: Task) -> Crew:
+                return Crew(agents=[agent], tasks=[task], process=Process.sequential, verbose=True)
+
+            researcher, writer = self.new_researcher(), self.new_writer()
+            angle_crews = {}
+            if RESEARCH_MODE == "parallel":
+                for angle in RESEARCH_ANGLES:
+                    angle_researcher = self.new_researcher()
+                    angle_crews[angle] = single_task_crew(angle_researcher, self.create_research_task(angle_researcher))
+            return CrewSet(
+                research_crew=single_task_crew(researcher, self.create_research_task(researcher)),
+                writing_crew=single_task_crew(writer, self.create_writing_task(writer)),
+                angle_crews=angle_crews,
+            )
+
+    def request_inputs(self, request: "ContentRequest") -> Dict[str, str]:
+        return {
+            "topic": request.topic,
+            "content_type": str(request.content_type),
+            "word_count": str(request.word_count),
+        }
+
+    def run_research(
+        self, request: "ContentRequest", crews: CrewSet, progress: Optional[ProgressChannel] = None
+    ) -> str:
+        """Research stage; in parallel mode each angle has its own researcher and crew"""
+        inputs = self.request_inputs(request)
+        if RESEARCH_MODE != "parallel":
+            focus = "\n".join(f"- {angle}" for angle in RESEARCH_ANGLES.values())
+            return str(crews.research_crew.kickoff(inputs={**inputs, "focus": focus}))
+
+        def research_angle(angle: str, focus: str) -> Optional[str]:
+            try:
+                report = str(crews.angle_crews[angle].kickoff(inputs={**inputs, "focus": f"- {focus}"}))
+            except Cancelled:
+                raise
+            except Exception as e:
+                # One failed angle shouldn't sink the whole article
+                logger.warning(f"Research angle '{angle}' failed: {e}")
+                return None
+            if progress:
+                progress.emit("research_part_finished", angle=angle)
+            return report
+
+        with ThreadPoolExecutor(max_workers=len(RESEARCH_ANGLES), thread_name_prefix="research") as pool:
+            futures = {
+                # Each sub-researcher runs in a copy of this thread's context (progress routing)
+                angle: pool.submit(contextvars.copy_context().run, research_angle, angle, focus)
+                for angle, focus in RESEARCH_ANGLES.items()
+            }
+            reports = {angle: future.result() for angle, future in futures.items()}
+        if not any(reports.values()):
+            raise RuntimeError("Every research angle failed")
+        return merge_research(reports)
+
+    def compact(self, request: "ContentRequest", research: str) -> Dict[str, Any]:
+        """Trim research to the writer's token budget for this article size"""
+        budget = token_budget(request.word_count or 0, RESEARCH_TOKENS_PER_WORD, RESEARCH_MIN_TOKENS, RESEARCH_MAX_TOKENS)
+        with STAGE_SECONDS.time(stage="compaction"):
+            compaction = compact_research(research, budget)
+        RESEARCH_TOKENS.observe(compaction.tokens_before, stage="raw")
+        RESEARCH_TOKENS.observe(compaction.tokens_after, stage="compacted")
+        if compaction.tokens_after < compaction.tokens_before:
+            logger.info(
+                f"Research for {request.topic!r} compacted from {compaction.tokens_before} to {compaction.tokens_after} tokens "
+                f"(budget {budget}; dropped {compaction.findings_dropped} findings, {compaction.duplicates} duplicates, "
+                f"{compaction.sources_dropped} sources)"
+            )
+        return {
+            "research": compaction.research,
+            "tokens": {"budget": budget, "raw": compaction.tokens_before, "compacted": compaction.tokens_after},
+        }
+
+    def run_writing(self, request: "ContentRequest", crews: CrewSet, research: str) -> str:
+        inputs = {**self.request_inputs(request), "research": research}
+        return str(crews.writing_crew.kickoff(inputs=inputs))
+
+    def run_pipeline(
+        self, request: "ContentRequest", progress: Optional[ProgressChannel] = None, research: Optional[str] = None
+    ) -> Dict[str, str]:
+        """Research, compact, then write; with `research` given only the writer runs. Blocking, runs in a crew worker thread"""
+        with STAGE_SECONDS.time(stage="crew_checkout"):
+            crews = self.crew_pool.acquire()
+        try:
+            if research is None:
+                checkpoint()
+                if progress:
+                    progress.emit("research_started", mode=RESEARCH_MODE)
+                with STAGE_SECONDS.time(stage="research"):
+                    research = self.run_research(request, crews, progress)
+                if progress:
+                    progress.emit("research_finished", research=research)
+            elif progress:
+                progress.emit("research_reused", research=research)
+            checkpoint()
+            # The full research is what gets stored and reused; only the writer's copy is compacted
+            context = self.compact(request, research)
+            if progress:
+                progress.emit("writing_started", research_tokens=context["tokens"])
+            with STAGE_SECONDS.time(stage="writing"):
+                content = self.run_writing(request, crews, context["research"])
+            if progress:
+                progress.emit("writing_finished")
+        finally:
+            crews.reset()
+            self.crew_pool.release(crews)
+        return {"content": content, "research": research, "research_tokens": context["tokens"]}
+
+    async def generate_content(
+        self, request: "ContentRequest", progress: Optional[ProgressChannel] = None, research: Optional[str] = None
+    ) -> Dict[str, Any]:
+        cancel = current_cancel.get()
+        started = None
+
+        def run():
+            nonlocal started
+            started = time.perf_counter()
+            # Runs in the worker thread; lets event-bus handlers, the model router and checkpoints find this request
+            token, request_token = current_progress.set(progress), current_request.set(request)
+            cancel_token = current_cancel.set(cancel)
+            try:
+                checkpoint()
+                return self.run_pipeline(request, progress, research)
+            finally:
+                current_cancel.reset(cancel_token)
+                current_request.reset(request_token)
+                current_progress.reset(token)
+
+        try:
+            with STAGE_SECONDS.time(stage="total"):
+                output = await anyio.to_thread.run_sync(run, limiter=self.limiter)
+        except Cancelled as e:
+            # Stopped at a checkpoint; the thread and its crews are free again
+            logger.info(f"Generation of {request.topic!r} stopped: {e}")
+            GENERATIONS_CANCELLED_TOTAL.inc(reason=e.reason, stage="running")
+            if started is not None:
+                CANCELLED_WORK_SECONDS.inc(time.perf_counter() - started, reason=e.reason)
+            raise
+        except Exception as e:
+            logger.error(f"Content generation failed: {e}")
+            GENERATIONS_TOTAL.inc(outcome="failed")
+            raise HTTPException(status_code=500, detail="Content generation failed")
+
+        with STAGE_SECONDS.time(stage="citation_extraction"):
+            report = citations.process(output["content"])
+        if report.issues:
+            logger.warning(f"Citation issues in {request.topic!r}: {report.issues}")
+
+        return {
+            "content": report.content,
+            "citations": report.citations,
+            "citation_issues": report.issues,
+            "research_summary": output["research"],
+            "research_tokens": output["research_tokens"],
+            # Primary models only; fallbacks are counted in llm_fallbacks_total
+            "models": {
+                stage: model for stage, model in model_router.plan(request).items()
+                if stage == "writing" or research is None
+            },
+        }
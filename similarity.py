@@ -0,0 +1,151 @@
+import logging
+import re
+import threading
+import zlib
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[^\W_]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in into is it of on or the to vs what why with".split()
+)
+
+# Common abbreviations expanded so "AI in healthcare" meets "healthcare artificial intelligence"
+ALIASES = {
+    "ai": "artificial intelligence",
+    "ml": "machine learning",
+    "llm": "large language model",
+    "llms": "large language models",
+    "iot": "internet of things",
+    "ev": "electric vehicle",
+    "evs": "electric vehicles",
+    "vr": "virtual reality",
+    "ar": "augmented reality",
+    "nlp": "natural language processing",
+}
+
+
+def _words(text: str) -> List[str]:
+    words: List[str] = []
+    for word in _WORD.findall(text.casefold()):
+        words.extend(ALIASES.get(word, word).split())
+    return [w for w in words if w not in STOPWORDS]
+
+
+def content_words(text: str) -> FrozenSet[str]:
+    """Words that carry meaning (aliases expanded, stopwords and plural -s dropped).
+
+    Cosine similarity can't tell "AI in education policy" or "not AI in
+    healthcare" from "AI in education" / "AI in healthcare"; comparing these
+    sets can, while word order, case and aliases still don't matter.
+    """
+    return frozenset(w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in _words(text))
+
+
+def features(text: str) -> List[str]:
+    """Word unigrams plus character trigrams, so morphology and spacing variants overlap"""
+    words = _words(text)
+    grams = [padded[i:i + 3] for w in words for padded in (f" {w} ",) for i in range(len(padded) - 2)]
+    return [f"w:{w}" for w in words] + [f"c:{g}" for g in grams]
+
+
+class SemanticIndex:
+    """In-memory hashed TF-IDF index for near-duplicate topic lookup.
+
+    Texts are hashed into `dim` buckets, weighted with sublinear TF and the
+    IDF of the corpus seen at the last `build`, and L2-normalized, so a query
+    is one matrix-vector product. Only the newest `max_items` entries are
+    kept. Thread-safe.
+    """
+
+    def __init__(self, dim: int = 1024, max_items: int = 50_000):
+        self.dim = dim
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._idf = np.ones(dim, dtype=np.float32)
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._size = 0
+        self._keys: List[str] = []
+        self._meta: List[Dict[str, Any]] = []
+
+    def build(self, items: Iterable[Tuple[str, str, Dict[str, Any]]]):
+        """Replace the index with `(key, text, meta)` items, recomputing IDF"""
+        items = list(items)[-self.max_items:]
+        counts = np.stack([self._term_counts(text) for _, text, _ in items]) if items else np.zeros((0, self.dim))
+        df = np.count_nonzero(counts, axis=0)
+        idf = np.log((1 + len(items)) / (1 + df)).astype(np.float32) + 1
+        vectors = self._normalize(_sublinear(counts) * idf) if items else np.zeros((0, self.dim), np.float32)
+        with self._lock:
+            self._idf = idf
+            self._vectors = vectors.astype(np.float32)
+            self._size = len(items)
+            self._keys = [key for key, _, _ in items]
+            self._meta = [meta for _, _, meta in items]
+        logger.info(f"Semantic index built: {len(items)} entries")
+
+    def add(self, key: str, text: str, meta: Optional[Dict[str, Any]] = None):
+        vector = self._embed(text)
+        with self._lock:
+            if self._size == len(self._vectors):
+                # Amortized growth; past max_items the oldest tenth is dropped
+                if self._size >= self.max_items:
+                    drop = max(1, self.max_items // 10)
+                    self._vectors = self._vectors[drop:self._size]
+                    self._keys, self._meta = self._keys[drop:], self._meta[drop:]
+                    self._size -= drop
+                grown = np.zeros((max(16, self._size * 2), self.dim), dtype=np.float32)
+                grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+            self._vectors[self._size] = vector
+            self._keys.append(key)
+            self._meta.append(meta or {})
+            self._size += 1
+
+    def query(
+        self,
+        text: str,
+        top_k: int = 1,
+        min_score: float = 0.0,
+        where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """Best `(cosine, key, meta)` matches for `text`, highest first"""
+        vector = self._embed(text)
+        with self._lock:
+            if not self._size:
+                return []
+            scores = self._vectors[:self._size] @ vector
+            # Only candidates above the threshold get sorted
+            candidates = np.flatnonzero(scores >= min_score)
+            matches = []
+            for i in candidates[np.argsort(-scores[candidates])]:
+                score = float(scores[i])
+                if where is None or where(self._meta[i]):
+                    matches.append((score, self._keys[i], self._meta[i]))
+                    if len(matches) == top_k:
+                        break
+            return matches
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _term_counts(self, text: str) -> np.ndarray:
+        counts = np.zeros(self.dim, dtype=np.float32)
+        for feature in features(text):
+            counts[zlib.crc32(feature.encode()) % self.dim] += 1
+        return counts
+
+    def _embed(self, text: str) -> np.ndarray:
+        return self._normalize(_sublinear(self._term_counts(text)) * self._idf)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+def _sublinear(counts: np.ndarray) -> np.ndarray:
+    return np.where(counts > 0, 1 + np.log(np.maximum(counts, 1)), 0).astype(np.float32)
@@ -0,0 +1,284 @@
+"""mainv2's HTTP API in-process (httpx ASGI transport, temporary database), with generation faked.
+
+Covers the session gate, rate-limit charging, job cancellation, batches on the
+job queue, cursor pagination and ETag revalidation.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+import uuid
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+try:
+    import httpx
+    import fastapi  # noqa: F401
+except ImportError:  # the API's own dependencies; everything else here is stdlib
+    httpx = None
+
+from cancellation import checkpoint  # noqa: E402
+from ratelimit import MemoryBucketStore, RateLimiter, Rule  # noqa: E402
+
+mainv2 = None
+scratch = None
+
+
+def setUpModule():
+    global mainv2, scratch
+    if httpx is None:
+        raise unittest.SkipTest("needs fastapi and httpx")
+    scratch = tempfile.TemporaryDirectory(prefix="test-api-")
+    env = {
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "test"),
+        "SEARCH_BACKEND": "stub",
+        "DATABASE_URL": "",
+        "CONTENT_DB_PATH": str(Path(scratch.name) / "content.db"),
+        "GENERATION_WORKERS": "1",
+        "GENERATION_QUEUE_SIZE": "3",
+        "JOB_ABANDON_AFTER": "0",
+        "RESULT_CACHE_TTL": "0",
+        "SIMILAR_REUSE_THRESHOLD": "2",
+        "RATE_LIMIT_SESSION": "off",
+        "RATE_LIMIT_CLIENT": "off",
+        "RATE_LIMIT_GLOBAL": "off",
+    }
+    with mock.patch.dict(os.environ, env):
+        import mainv2 as module
+    mainv2 = module
+
+
+def tearDownModule():
+    if scratch is not None:
+        mainv2.adb.db.close()
+        scratch.cleanup()
+
+
+def article(topic: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "topic": topic,
+        "content": f"An article about {topic}.",
+        "citations": [],
+        "generated_at": datetime(2024, 1, 1),
+        "metadata": {"content_type": "blog_post", "word_count": 800},
+    }
+
+
+class APITestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # Generations wait for `release`, then stop at a checkpoint if cancelled
+        self.release = asyncio.Event()
+        self.generated = []
+
+        async def generate_cached(request, progress=None):
+            self.generated.append(request.topic)
+            await self.release.wait()
+            checkpoint()
+            return {"content": f"Article on {request.topic}.", "citations": []}, "miss"
+
+        self.patch(mainv2, "generate_cached", generate_cached)
+        self.patch(mainv2, "rate_limiter", RateLimiter(MemoryBucketStore(), {}))
+        await mainv2.job_queue.start()
+        self.addAsyncCleanup(mainv2.job_queue.stop)
+        self.transport = httpx.ASGITransport(app=mainv2.app)
+
+    def patch(self, target, name, value):
+        patcher = mock.patch.object(target, name, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def client(self, session_id: str = None) -> httpx.AsyncClient:
+        # https: the session cookie is Secure
+        client = httpx.AsyncClient(transport=self.transport, base_url="https://test")
+        if session_id:
+            client.cookies.set("session_id", session_id)
+        self.addAsyncCleanup(client.aclose)
+        return client
+
+    async def wait_for(self, job_id: str, *states: str) -> dict:
+        for _ in range(200):
+            job = mainv2.job_queue.get(job_id)
+            if job.state.value in states:
+                return mainv2.job_response(job).model_dump(mode="json")
+            await asyncio.sleep(0.01)
+        self.fail(f"job {job_id} never reached {states}")
+
+
+class SessionGateTest(APITestCase):
+    async def test_one_generation_per_session(self):
+        client = self.client()
+        first = await client.post("/generate", json={"topic": "Tidal energy"})
+        self.assertEqual(first.status_code, 202)
+        self.assertIn("session_id", client.cookies)
+
+        # Still queued or running: the same session is turned away
+        second = await client.post("/generate", json={"topic": "Wave energy"})
+        self.assertEqual(second.status_code, 403)
+
+        self.release.set()
+        await self.wait_for(first.json()["id"], "succeeded")
+        # Saved: still turned away
+        third = await client.post("/generate", json={"topic": "Wind energy"})
+        self.assertEqual(third.status_code, 403)
+
+    async def test_concurrent_requests_of_a_session_claim_it_once(self):
+        lookup = mainv2.adb.session_has_content
+
+        async def slow_lookup(session_id):
+            await asyncio.sleep(0.05)
+            return await lookup(session_id)
+
+        self.patch(mainv2.adb, "session_has_content", slow_lookup)
+        session = f"race-{uuid.uuid4()}"
+        responses = await asyncio.gather(*(
+            self.client(session).post("/generate", json={"topic": f"Race topic {i}"}) for i in range(3)
+        ))
+        self.assertEqual(sorted(r.status_code for r in responses), [202, 403, 403])
+        self.assertNotIn(session, mainv2.claimed_sessions)
+
+
+class RateLimitTest(APITestCase):
+    async def test_refused_sessions_are_not_charged(self):
+        self.patch(mainv2, "rate_limiter", RateLimiter(MemoryBucketStore(), {"client": Rule(2, 60)}))
+        first = self.client()
+        self.assertEqual((await first.post("/generate", json={"topic": "First topic"})).status_code, 202)
+        # 403 for the session; the client bucket keeps its second token
+        self.assertEqual((await first.post("/generate", json={"topic": "Again"})).status_code, 403)
+
+        self.assertEqual((await self.client().post("/generate", json={"topic": "Second topic"})).status_code, 202)
+        third = await self.client().post("/generate", json={"topic": "Third topic"})
+        self.assertEqual(third.status_code, 429)
+        self.assertIn("Retry-After", third.headers)
+
+
+class CancelJobTest(APITestCase):
+    async def test_delete_queued_and_running_jobs(self):
+        owner, other = self.client(), self.client()
+        running = (await owner.post("/generate", json={"topic": "Running topic"})).json()["id"]
+        await self.wait_for(running, "running")
+        queued = (await other.post("/generate", json={"topic": "Queued topic"})).json()["id"]
+
+        # Only the submitting session may cancel
+        self.assertEqual((await owner.delete(f"/jobs/{queued}")).status_code, 404)
+        self.assertEqual((await self.client().delete(f"/jobs/{queued}")).status_code, 404)
+
+        # A queued job is finished right away
+        response = await other.delete(f"/jobs/{queued}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "cancelled")
+        self.assertEqual(response.json()["error"], "Cancelled by the client")
+        self.assertNotIn("Queued topic", self.generated)
+
+        # A running one stops at its next checkpoint
+        self.assertEqual((await owner.delete(f"/jobs/{running}")).json()["status"], "running")
+        self.release.set()
+        job = await self.wait_for(running, "cancelled")
+        self.assertEqual(job["error"], "Cancelled by the client")
+        self.assertIsNone(job["result"])
+        self.assertFalse(await mainv2.adb.session_has_content(mainv2.job_queue.get(running).session_id))
+
+    async def test_unknown_job(self):
+        self.assertEqual((await self.client().get("/jobs/nope")).status_code, 404)
+        self.assertEqual((await self.client().delete("/jobs/nope")).status_code, 404)
+
+
+class BatchTest(APITestCase):
+    async def test_duplicates_run_once_and_results_are_saved(self):
+        self.release.set()
+        response = await self.client().post("/generate/batch", json={"items": [
+            {"topic": "Batch solar"}, {"topic": "Batch wind"}, {"topic": "  batch SOLAR "},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["total"], body["succeeded"], body["failed"]), (3, 3, 0))
+        self.assertEqual([item["status"] for item in body["items"]], ["succeeded", "succeeded", "duplicate"])
+        self.assertEqual(body["items"][2]["duplicate_of"], 0)
+        self.assertEqual(sorted(self.generated), ["Batch solar", "Batch wind"])
+        for item in body["items"][:2]:
+            self.assertIsNotNone(await mainv2.adb.get_content(item["id"]))
+
+    async def test_failed_save_fails_every_item(self):
+        self.release.set()
+
+        async def save_many(session_id, items):
+            return 0
+
+        self.patch(mainv2.adb, "save_many", save_many)
+        response = await self.client().post("/generate/batch", json={"items": [{"topic": "Lost one"}, {"topic": "Lost two"}]})
+        body = response.json()
+        self.assertEqual((body["succeeded"], body["failed"]), (0, 2))
+        for item in body["items"]:
+            self.assertEqual(item["status"], "failed")
+            self.assertEqual(item["error"], "Saving the generated content failed")
+
+    async def test_backpressure(self):
+        too_big = await self.client().post("/generate/batch", json={"items": [{"topic": f"Topic {i}"} for i in range(4)]})
+        self.assertEqual(too_big.status_code, 413)
+
+        # One job running, two queued: one slot left
+        for i in range(3):
+            self.assertEqual((await self.client().post("/generate", json={"topic": f"Filler {i}"})).status_code, 202)
+        no_room = await self.client().post("/generate/batch", json={"items": [{"topic": "Topic a"}, {"topic": "Topic b"}]})
+        self.assertEqual(no_room.status_code, 429)
+        self.assertEqual(no_room.headers["Retry-After"], "30")
+        self.release.set()
+
+
+class ContentTest(APITestCase):
+    async def test_cursor_pagination_visits_every_row_once(self):
+        items = [article(f"Paged topic {i}") for i in range(5)]
+        await mainv2.adb.save_many(f"pages-{uuid.uuid4()}", items)
+        client = self.client()
+
+        seen, cursor = [], None
+        while True:
+            response = await client.get("/all-content", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page["content"]), 2)
+            seen.extend(item["id"] for item in page["content"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertLessEqual({item["id"] for item in items}, set(seen))
+        self.assertEqual(page["total"], len(seen))
+
+        self.assertEqual((await client.get("/all-content", params={"cursor": "not-a-cursor"})).status_code, 400)
+
+    async def test_etag_revalidation(self):
+        item = article("Cached topic")
+        await mainv2.adb.save_content(f"etag-{uuid.uuid4()}", item)
+        client = self.client()
+
+        first = await client.get(f"/content/{item['id']}")
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["ETag"]
+        self.assertTrue(etag.startswith('"') and etag.endswith('"'))
+        self.assertIn("max-age", first.headers["Cache-Control"])
+        self.assertEqual(first.json()["content"], item["content"])
+
+        for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            revalidated = await client.get(f"/content/{item['id']}", headers={"If-None-Match": header})
+            self.assertEqual(revalidated.status_code, 304, header)
+            self.assertEqual(revalidated.content, b"")
+            self.assertEqual(revalidated.headers["ETag"], etag)
+        changed = await client.get(f"/content/{item['id']}", headers={"If-None-Match": '"other"'})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual((await client.get("/content/missing")).status_code, 404)
+
+    def test_etag_matches(self):
+        self.assertFalse(mainv2.etag_matches(None, '"a"'))
+        self.assertFalse(mainv2.etag_matches('"b"', '"a"'))
+        self.assertTrue(mainv2.etag_matches(' W/"a" ', '"a"'))
+        self.assertTrue(mainv2.etag_matches('"b", "a"', '"a"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Reference parsing, marker linking and numbering checks in citations.py."""
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import citations  # noqa: E402
+
+REFERENCES = """
+## References
+
+[1] First source | Ada | 2024-01-01 | https://example.com/1 | Web
+[2] Second source | Bob | 2024-01-02 | https://example.com/2 | Web
+- [3] Third source https://example.com/3
+[2] Listed twice | Bob | 2024-01-02 | https://example.com/2b | Web
+"""
+
+
+class ProcessTest(unittest.TestCase):
+    def test_links_markers_and_reports_issues(self):
+        article = "# Title\n\nGrowth is fast [1]. Adoption lags [2, 4] and [1-3].\n" + REFERENCES
+        report = citations.process(article)
+
+        self.assertEqual([c["number"] for c in report.citations], [1, 2, 3])
+        self.assertEqual(report.citations[1]["url"], "https://example.com/2")
+        self.assertEqual(report.citations[2]["url"], "https://example.com/3")
+        self.assertEqual(report.cited, [1, 2, 4, 3])
+        self.assertEqual(report.issues, {"dangling": [4], "duplicates": [2]})
+        self.assertIn("fast [[1]](https://example.com/1).", report.content)
+        self.assertIn("lags [[2]](https://example.com/2)[4] and", report.content)
+        # The References section itself is left alone
+        self.assertTrue(report.content.endswith(REFERENCES))
+
+    def test_matches_link_citations(self):
+        article = "Text [2] and [3].\n" + REFERENCES
+        report = citations.process(article)
+        self.assertEqual(report.content, citations.link_citations(article, citations.extract_citations(article)))
+        self.assertEqual(citations.process(article, link=False).content, article)
+        self.assertEqual(citations.process(article, link=False).cited, [2, 3])
+
+    def test_ignores_zero_and_code(self):
+        article = (
+            "Index with `a[1]` or a[0] [1].\n\n"
+            "```python\nvalues[2] = values[3]\n```\n\n"
+            "~~~\n[3]\n~~~\n"
+            "Then [2].\n" + REFERENCES
+        )
+        report = citations.process(article)
+        self.assertEqual(report.cited, [1, 2])
+        self.assertEqual(report.issues, {"unused": [3], "duplicates": [2]})
+        self.assertIn("`a[1]` or a[0] [[1]](https://example.com/1)", report.content)
+        self.assertIn("values[2] = values[3]\n```", report.content)
+        self.assertIn("~~~\n[3]\n~~~", report.content)
+
+    def test_already_linked_markers_are_skipped(self):
+        article = "See [[1]](https://example.com/1) and [2](https://x).\n" + REFERENCES
+        report = citations.process(article)
+        self.assertEqual(report.cited, [])
+        self.assertEqual(report.content, article)
+
+    def test_without_references(self):
+        report = citations.process("No sources here [1].")
+        self.assertEqual(report.citations, [])
+        self.assertEqual(report.issues, {"dangling": [1]})
+        self.assertIsNone(citations.split_references("No sources here [1]."))
+        self.assertEqual(citations.extract_citations(""), [])
+
+    def test_last_heading_wins(self):
+        article = "Intro.\n\nSources\n\nThe sources we used [1].\n" + REFERENCES
+        self.assertEqual(citations.split_references(article), article.index("## References"))
+        self.assertEqual(citations.process(article).cited, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Fitting research into the writer's token budget with compaction.py."""
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from compaction import compact_research, count_tokens  # noqa: E402
+
+BIBLIOGRAPHY = "\n\n## Bibliography\n\n[1] Survey https://example.com/survey\n[2] Report https://example.com/report"
+
+
+class CompactResearchTest(unittest.TestCase):
+    def test_within_budget_passes_through(self):
+        research = "- Adoption reached 12% in 2021 [1]." + BIBLIOGRAPHY
+        compaction = compact_research(research, budget=10_000)
+        self.assertEqual(compaction.research, research)
+        self.assertEqual(compaction.findings_dropped, 0)
+
+    def test_statistics_differing_in_numbers_are_not_duplicates(self):
+        stats = [
+            f"- Adoption of rooftop solar among rural households in the northern region reached {10 + i}% in {1900 + i} [1]."
+            for i in range(200)
+        ]
+        research = "\n".join(stats) + BIBLIOGRAPHY
+        compaction = compact_research(research, budget=count_tokens(research) - 1)
+
+        self.assertEqual(compaction.duplicates, 0)
+        self.assertGreater(compaction.findings_kept, 150)
+
+    def test_rephrased_findings_are_duplicates(self):
+        research = "\n".join([
+            "- Adoption of solar panels in rural regions reached 12% in 2021 [1].",
+            "- In 2021, adoption of solar panels in rural regions reached 12% [2].",
+            "- Adoption of solar panels in rural regions reached 18% in 2023 [2].",
+            "- Installers report long waiting lists.",
+        ]) + BIBLIOGRAPHY
+        compaction = compact_research(research, budget=count_tokens(research) - 1)
+
+        self.assertEqual(compaction.duplicates, 1)
+        self.assertIn("12% in 2021 [1]", compaction.research)
+        self.assertIn("18% in 2023 [2]", compaction.research)
+        self.assertNotIn("In 2021, adoption", compaction.research)
+
+    def test_keeps_cited_statistics_and_their_sources_first(self):
+        research = "\n".join([
+            "- Some people like it.",
+            "- Costs fell 40% since 2015 [2].",
+        ]) + BIBLIOGRAPHY
+        budget = count_tokens("- Costs fell 40% since 2015 [2].\n\n## Bibliography\n\n[2] Report https://example.com/report") + 2
+        compaction = compact_research(research, budget=budget)
+
+        self.assertEqual(compaction.findings_kept, 1)
+        self.assertIn("Costs fell 40%", compaction.research)
+        self.assertIn("[2] Report", compaction.research)
+        self.assertNotIn("[1] Survey", compaction.research)
+        self.assertLessEqual(compaction.tokens_after, budget)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+"""The generation queue in jobs.py: backpressure, per-job handlers, cancellation and waiting for results."""
+import asyncio
+import sys
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from cancellation import CancelToken, Cancelled  # noqa: E402
+from jobs import JobQueue, JobState, QueueFullError  # noqa: E402
+
+
+class JobQueueTestCase(unittest.IsolatedAsyncioTestCase):
+    workers = 1
+    max_size = 3
+
+    async def asyncSetUp(self):
+        self.release = asyncio.Event()
+        self.queue = JobQueue(self.handler, workers=self.workers, max_size=self.max_size)
+        await self.queue.start()
+        self.addAsyncCleanup(self.queue.stop)
+
+    async def handler(self, job):
+        await self.release.wait()
+        return {"topic": job.request}
+
+    async def started(self, job):
+        while job.state == JobState.QUEUED:
+            await asyncio.sleep(0)
+
+
+class BackpressureTest(JobQueueTestCase):
+    async def test_room_and_queue_full(self):
+        self.assertEqual(self.queue.room(), 3)
+        running = self.queue.submit("s1", "a")
+        await self.started(running)
+        # The running job has left the queue
+        self.assertEqual(self.queue.room(), 3)
+
+        for topic in "bcd":
+            self.queue.submit("s1", topic)
+        self.assertEqual(self.queue.room(), 0)
+        with self.assertRaises(QueueFullError):
+            self.queue.submit("s2", "e")
+        self.assertEqual(self.queue.stats()["queued"], 3)
+
+    async def test_has_pending_until_every_job_of_the_session_finished(self):
+        jobs = [self.queue.submit("s1", topic) for topic in "ab"]
+        self.assertTrue(self.queue.has_pending("s1"))
+        self.assertFalse(self.queue.has_pending("s2"))
+
+        self.release.set()
+        for job in jobs:
+            await self.queue.wait(job)
+        self.assertFalse(self.queue.has_pending("s1"))
+
+
+class HandlerTest(JobQueueTestCase):
+    async def test_wait_returns_the_finished_job(self):
+        job = self.queue.submit("s1", "a")
+        self.release.set()
+        self.assertIs(await asyncio.wait_for(self.queue.wait(job), 1), job)
+        self.assertEqual(job.state, JobState.SUCCEEDED)
+        self.assertEqual(job.result, {"topic": "a"})
+        self.assertIsNotNone(job.finished_at)
+
+    async def test_job_handler_overrides_the_queue_handler(self):
+        async def shout(job):
+            return {"topic": job.request.upper()}
+
+        job = self.queue.submit("s1", "a", handler=shout)
+        await asyncio.wait_for(self.queue.wait(job), 1)
+        self.assertEqual(job.result, {"topic": "A"})
+
+    async def test_handler_errors_fail_the_job(self):
+        async def broken(job):
+            raise RuntimeError("Saving the generated content failed")
+
+        job = self.queue.submit("s1", "a", handler=broken)
+        await asyncio.wait_for(self.queue.wait(job), 1)
+        self.assertEqual(job.state, JobState.FAILED)
+        self.assertEqual(job.error, "Saving the generated content failed")
+        self.assertFalse(self.queue.has_pending("s1"))
+
+    async def test_stop_fails_waiting_jobs(self):
+        running = self.queue.submit("s1", "a")
+        queued = self.queue.submit("s1", "b")
+        await self.started(running)
+
+        await self.queue.stop()
+        for job in (running, queued):
+            await asyncio.wait_for(self.queue.wait(job), 1)
+            self.assertEqual(job.state, JobState.FAILED)
+            self.assertEqual(job.error, "Server shutting down")
+
+
+class CancelTest(JobQueueTestCase):
+    async def handler(self, job):
+        # Like run_generation_job: stop at the checkpoint after each step
+        await self.release.wait()
+        job.cancel.check()
+        return {"topic": job.request}
+
+    async def test_cancelling_a_queued_job_finishes_it_at_once(self):
+        running = self.queue.submit("s1", "a")
+        await self.started(running)
+        queued = self.queue.submit("s2", "b")
+
+        self.queue.cancel(queued)
+        self.assertEqual(queued.state, JobState.CANCELLED)
+        self.assertEqual(queued.error, "Cancelled by the client")
+        self.assertFalse(self.queue.has_pending("s2"))
+
+        # The worker skips it and the running job is unaffected
+        self.release.set()
+        await asyncio.wait_for(self.queue.wait(running), 1)
+        self.assertEqual(running.state, JobState.SUCCEEDED)
+        self.assertEqual(queued.state, JobState.CANCELLED)
+
+    async def test_cancelling_a_running_job_stops_it_at_the_next_checkpoint(self):
+        job = self.queue.submit("s1", "a")
+        await self.started(job)
+
+        self.queue.cancel(job, "disconnected")
+        self.assertEqual(job.state, JobState.RUNNING)
+        self.release.set()
+        await asyncio.wait_for(self.queue.wait(job), 1)
+        self.assertEqual(job.state, JobState.CANCELLED)
+        self.assertEqual(job.error, "Client disconnected")
+        self.assertIsNone(job.result)
+        self.assertFalse(self.queue.has_pending("s1"))
+
+    async def test_jobs_overdue_in_the_queue_never_start(self):
+        running = self.queue.submit("s1", "a")
+        await self.started(running)
+        overdue = self.queue.submit("s2", "b", cancel=CancelToken(timeout=0.01))
+        await asyncio.sleep(0.02)
+
+        self.release.set()
+        await asyncio.wait_for(self.queue.wait(overdue), 1)
+        self.assertEqual(overdue.state, JobState.CANCELLED)
+        self.assertEqual(overdue.error, "Generation timed out")
+        self.assertIsNone(overdue.started_at)
+
+
+class CancelTokenTest(unittest.TestCase):
+    def test_first_reason_sticks(self):
+        token = CancelToken()
+        self.assertIsNone(token.poll())
+        token.cancel("disconnected")
+        token.cancel()
+        self.assertEqual(token.poll(), "disconnected")
+        with self.assertRaises(Cancelled) as raised:
+            token.check()
+        self.assertEqual(str(raised.exception), "Client disconnected")
+
+    def test_unpolled_jobs_are_abandoned_and_touch_keeps_them(self):
+        token = CancelToken(idle_timeout=0.1)
+        time.sleep(0.06)
+        token.touch()
+        time.sleep(0.06)
+        self.assertIsNone(token.poll())
+        time.sleep(0.1)
+        self.assertEqual(token.poll(), "abandoned")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""PostgresContentDB against a real server: skipped unless DATABASE_URL is set and asyncpg is installed.
+
+Point DATABASE_URL at a scratch database; the tests delete only the rows they wrote.
+"""
+import os
+import sys
+import unittest
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from pgdb import PostgresContentDB, asyncpg  # noqa: E402
+
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+
+
+def article(topic: str, content: str) -> dict:
+    return {
+        "id": f"test-{uuid.uuid4()}",
+        "topic": topic,
+        "content": content,
+        "citations": [{"number": 1, "url": "https://example.com"}],
+        "generated_at": datetime(2024, 1, 1),
+        "metadata": {"content_type": "blog_post"},
+    }
+
+
+@unittest.skipUnless(DATABASE_URL.startswith("postgres") and asyncpg, "needs DATABASE_URL=postgresql://... and asyncpg")
+class PostgresContentDBTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = PostgresContentDB(DATABASE_URL, pool_size=2)
+        self.session = f"test-{uuid.uuid4()}"
+
+    async def asyncTearDown(self):
+        async with (await self.db.pool()).acquire() as conn:
+            await conn.execute("DELETE FROM content WHERE session_id = $1", self.session)
+        await self.db.close()
+
+    async def test_save_and_read_back(self):
+        item = article("Tidal power", "Tidal turbines generate power twice a day.")
+        self.assertFalse(await self.db.session_has_content(self.session))
+        await self.db.save_content(self.session, item)
+
+        self.assertTrue(await self.db.session_has_content(self.session))
+        stored = await self.db.get_content(item["id"])
+        self.assertEqual(stored["content"], item["content"])
+        self.assertEqual(stored["citations"], item["citations"])
+        self.assertEqual(stored["metadata"], item["metadata"])
+
+    async def test_session_gate_reads_the_database(self):
+        await self.db.save_content(self.session, article("Shared", "Saved by another node."))
+        other_node = PostgresContentDB(DATABASE_URL, pool_size=1)
+        try:
+            self.assertTrue(await other_node.session_has_content(self.session))
+            self.assertFalse(await other_node.session_has_content(f"test-{uuid.uuid4()}"))
+        finally:
+            await other_node.close()
+
+    async def test_save_many_and_cursor_pages(self):
+        items = [article(f"Page topic {i}", f"Body {i}.") for i in range(5)]
+        before = await self.db.count_content()
+        self.assertEqual(await self.db.save_many(self.session, items), 5)
+        self.assertEqual(await self.db.count_content(), before + 5)
+        # A failed insert (duplicate id) saves nothing and says so
+        self.assertEqual(await self.db.save_many(self.session, items[:1]), 0)
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = await self.db.get_content_page(limit=2, cursor=cursor)
+            seen.extend(row["id"] for row in page)
+            if cursor is None:
+                break
+        # One transaction shares one created_at, so the rows come back by id; every row exactly once
+        ids = {item["id"] for item in items}
+        self.assertEqual([i for i in seen if i in ids], sorted(ids, reverse=True))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    async def test_search_escapes_snippets(self):
+        marker = uuid.uuid4().hex[:8]
+        item = article(f"Escaping {marker}", f"Never echo <script>{marker}</script> & friends back to the browser.")
+        await self.db.save_content(self.session, item)
+
+        results, total = await self.db.search(f"{marker} browser")
+        self.assertEqual(total, 1)
+        self.assertEqual(results[0]["id"], item["id"])
+        snippet = results[0]["snippet"]
+        self.assertIn("&lt;script&gt;", snippet)
+        self.assertIn("&amp;", snippet)
+        self.assertIn("<mark>", snippet)
+        self.assertNotIn("<script>", snippet)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Token-bucket admission in ratelimit.py: bursts, refill, all-or-nothing payment and the shared SQLite store."""
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from ratelimit import MemoryBucketStore, RateLimiter, Rule, SQLiteBucketStore  # noqa: E402
+
+
+class RuleTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(Rule.parse("10/60"), Rule(10, 60))
+        self.assertEqual(Rule.parse(" 5 "), Rule(5, 1))
+        self.assertEqual(Rule(10, 60).rate, 10 / 60)
+        for spec in ("", "off", "OFF", "0"):
+            self.assertIsNone(Rule.parse(spec))
+
+
+class RateLimiterTest(unittest.TestCase):
+    def limiter(self, store=None, **rules) -> RateLimiter:
+        return RateLimiter(store or MemoryBucketStore(), rules)
+
+    def test_burst_then_wait(self):
+        limiter = self.limiter(client=Rule(3, 60))
+        for _ in range(3):
+            self.assertIsNone(limiter.check({"client": "1.2.3.4"}))
+        scope, wait = limiter.check({"client": "1.2.3.4"})
+        self.assertEqual(scope, "client")
+        self.assertAlmostEqual(wait, 20, delta=0.1)
+        # Buckets are per key
+        self.assertIsNone(limiter.check({"client": "5.6.7.8"}))
+
+    def test_refill(self):
+        limiter = self.limiter(session=Rule(1, 0.05))
+        self.assertIsNone(limiter.check({"session": "s1"}))
+        self.assertIsNotNone(limiter.check({"session": "s1"}))
+        time.sleep(0.06)
+        self.assertIsNone(limiter.check({"session": "s1"}))
+
+    def test_a_rejection_pays_nothing(self):
+        limiter = self.limiter(session=Rule(1, 60), client=Rule(2, 60))
+        self.assertIsNone(limiter.check({"session": "s1", "client": "c"}))
+        # The session bucket is empty; the client bucket must keep its token
+        self.assertEqual(limiter.check({"session": "s1", "client": "c"})[0], "session")
+        self.assertIsNone(limiter.check({"session": "s2", "client": "c"}))
+        self.assertEqual(limiter.check({"session": "s3", "client": "c"})[0], "client")
+
+    def test_cost_is_capped_at_the_burst(self):
+        limiter = self.limiter(client=Rule(5, 60))
+        self.assertIsNone(limiter.check({"client": "c"}, cost=50))
+        scope, wait = limiter.check({"client": "c"}, cost=50)
+        self.assertAlmostEqual(wait, 60, delta=0.1)
+
+    def test_global_applies_without_a_key_and_missing_keys_are_skipped(self):
+        limiter = self.limiter(session=Rule(1, 60), **{"global": Rule(2, 60)})
+        self.assertIsNone(limiter.check({}))
+        self.assertIsNone(limiter.check({"session": None}))
+        self.assertEqual(limiter.check({})[0], "global")
+
+    def test_no_rules_disables_it(self):
+        limiter = self.limiter(session=None, client=Rule.parse("off"))
+        self.assertFalse(limiter.enabled)
+        self.assertIsNone(limiter.check({"session": "s1", "client": "c"}, cost=100))
+
+    def test_sqlite_store_is_shared_between_processes(self):
+        scratch = tempfile.TemporaryDirectory(prefix="test-ratelimit-")
+        self.addCleanup(scratch.cleanup)
+        path = str(Path(scratch.name) / "ratelimit.db")
+        # Two stores on one file stand in for two uvicorn workers
+        first = self.limiter(SQLiteBucketStore(path), client=Rule(2, 60))
+        second = self.limiter(SQLiteBucketStore(path), client=Rule(2, 60))
+        self.assertIsNone(first.check({"client": "c"}))
+        self.assertIsNone(second.check({"client": "c"}))
+        self.assertEqual(first.check({"client": "c"})[0], "client")
+        self.assertEqual(second.check({"client": "c"})[0], "client")
+        for store in (first.store, second.store):
+            store.connect().close()
+
+
+if __name__ == "__main__":
+    unittest.main()
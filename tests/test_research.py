@@ -0,0 +1,42 @@
+"""Merging the parallel research sub-reports in research.py."""
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from research import merge_research, split_report  # noqa: E402
+
+
+class MergeResearchTest(unittest.TestCase):
+    def test_renumbers_into_one_bibliography(self):
+        merged = merge_research({
+            "news": "Adoption doubled [1]. Prices fell [2].\n\nReferences\n[1] Alpha https://a.com\n[2] Beta https://b.com",
+            "statistics": "Usage grew 40% [1] [2].\n\nSources\n[1] Gamma https://c.com\n[2] Alpha again https://www.a.com/",
+        })
+        body, entries = split_report(merged)
+
+        self.assertEqual(entries, {1: "Alpha https://a.com", 2: "Beta https://b.com", 3: "Gamma https://c.com"})
+        self.assertIn("Adoption doubled [1]. Prices fell [2].", body)
+        self.assertIn("Usage grew 40% [3] [1].", body)
+
+    def test_markers_missing_from_the_bibliography_are_dropped(self):
+        merged = merge_research({
+            "news": "Fact [1]. Unsourced claim [2].\n\nReferences\n[1] Alpha https://a.com",
+            "experts": "Quote [1]. Stray [3] marker.\n\nReferences\n[1] Beta https://b.com\n[2] Gamma https://c.com",
+        })
+        body, entries = split_report(merged)
+
+        self.assertEqual(len(entries), 3)
+        # [2] and [3] now belong to Beta and Gamma, so the unknown markers must not survive as those numbers
+        self.assertIn("Fact [1]. Unsourced claim.", body)
+        self.assertIn("Quote [2]. Stray marker.", body)
+
+    def test_report_without_bibliography(self):
+        merged = merge_research({"news": "Nothing cited [4] here.", "examples": None})
+        self.assertEqual(merged, "## Latest news, trends, and industry developments\n\nNothing cited here.")
+
+
+if __name__ == "__main__":
+    unittest.main()
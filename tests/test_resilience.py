@@ -0,0 +1,165 @@
+"""Retries, circuit breaking and hedging in resilience.py against the flaky server of
+benchmarks/flaky_dependencies.py. Stdlib only: `python -m pytest tests` or `python -m unittest discover tests`.
+"""
+import sys
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from flaky_dependencies import FlakyServer  # noqa: E402
+from resilience import CircuitBreaker, CircuitOpenError, Dependency, RetryPolicy  # noqa: E402
+
+FAST_RETRY = RetryPolicy(attempts=3, base_delay=0.001, max_delay=0.01)
+
+
+class FlakyServerTestCase(unittest.TestCase):
+    latency = 0.001
+    slow_rate = 0.0
+    slow_latency = 0.0
+
+    def setUp(self):
+        self.server = FlakyServer(self.latency, error_rate=0.0, slow_rate=self.slow_rate, slow_latency=self.slow_latency)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def fetch(self) -> bytes:
+        with urllib.request.urlopen(self.server.url, timeout=5) as response:
+            return response.read()
+
+
+class RetryTest(FlakyServerTestCase):
+    def test_retry_succeeds_after_transient_errors(self):
+        dependency = Dependency("test-retry-ok", retry=FAST_RETRY)
+        self.server.fail_next = 2
+
+        self.assertEqual(dependency.call(self.fetch, hedge=False), b'{"organic": []}')
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(dependency.retries, 2)
+        self.assertEqual(dependency.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_gives_up_after_the_last_attempt(self):
+        dependency = Dependency("test-retry-exhausted", retry=FAST_RETRY)
+        self.server.fail_next = 5
+
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            dependency.call(self.fetch, hedge=False)
+        self.assertEqual(raised.exception.code, 503)
+        self.assertEqual(self.server.requests, FAST_RETRY.attempts)
+
+    def test_no_retry_on_client_errors(self):
+        dependency = Dependency("test-retry-404", retry=FAST_RETRY)
+        self.server.fail_status = 404
+        self.server.fail_next = 1
+
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            dependency.call(self.fetch, hedge=False)
+        self.assertEqual(raised.exception.code, 404)
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(dependency.retries, 0)
+        # The dependency answered, so a bad request doesn't count towards opening the circuit
+        self.assertEqual(dependency.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_no_retry_on_other_exceptions(self):
+        dependency = Dependency("test-retry-valueerror", retry=FAST_RETRY)
+        calls = []
+
+        def parse():
+            calls.append(self.fetch())
+            raise ValueError("unexpected payload")
+
+        with self.assertRaises(ValueError):
+            dependency.call(parse, hedge=False)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(dependency.retries, 0)
+
+
+class CircuitBreakerTest(FlakyServerTestCase):
+    def test_opens_after_consecutive_failures_then_half_opens(self):
+        breaker = CircuitBreaker("test-circuit", failures=3, reset_after=0.2)
+        dependency = Dependency("test-circuit", retry=RetryPolicy(attempts=1), breaker=breaker)
+        self.server.down = True
+
+        for _ in range(3):
+            with self.assertRaises(urllib.error.HTTPError):
+                dependency.call(self.fetch, hedge=False)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        # Open: calls fail fast without reaching the server
+        with self.assertRaises(CircuitOpenError):
+            dependency.call(self.fetch, hedge=False)
+        self.assertEqual(self.server.requests, 3)
+
+        # After reset_after one probe goes through; its failure opens the circuit again
+        time.sleep(0.25)
+        with self.assertRaises(urllib.error.HTTPError):
+            dependency.call(self.fetch, hedge=False)
+        self.assertEqual(self.server.requests, 4)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            dependency.call(self.fetch, hedge=False)
+
+        # A successful probe closes it
+        time.sleep(0.25)
+        self.server.down = False
+        self.assertEqual(dependency.call(self.fetch, hedge=False), b'{"organic": []}')
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = CircuitBreaker("test-circuit-probe", failures=1, reset_after=0.05)
+        breaker.failure()
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_retries_stop_once_the_circuit_opens(self):
+        breaker = CircuitBreaker("test-circuit-retry", failures=2, reset_after=60)
+        dependency = Dependency("test-circuit-retry", retry=RetryPolicy(attempts=5, base_delay=0.001), breaker=breaker)
+        self.server.down = True
+
+        with self.assertRaises(urllib.error.HTTPError):
+            dependency.call(self.fetch, hedge=False)
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+
+class HedgingTest(FlakyServerTestCase):
+    # A few requests stall far beyond everybody else's p95
+    latency = 0.002
+    slow_rate = 0.05
+    slow_latency = 0.5
+
+    def test_hedges_stay_within_budget(self):
+        dependency = Dependency("test-hedge", retry=FAST_RETRY, hedge_budget=0.02)
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            bodies = list(pool.map(lambda _: dependency.call(self.fetch), range(300)))
+
+        self.assertTrue(all(body == b'{"organic": []}' for body in bodies))
+        self.assertGreater(dependency.hedges, 0)
+        # The budget is checked before each hedge is counted, so it can be passed by at most one
+        self.assertLess(dependency.hedges, dependency.hedge_budget * dependency.calls + 1)
+
+    def test_no_hedges_without_budget(self):
+        dependency = Dependency("test-hedge-off", retry=FAST_RETRY)
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(lambda _: dependency.call(self.fetch), range(50)))
+
+        self.assertEqual(dependency.hedges, 0)
+        self.assertEqual(dependency.calls, 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
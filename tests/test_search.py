@@ -0,0 +1,76 @@
+"""Full-text search in db.py: ranking, snippets and the background backfill, on a temporary database."""
+import sys
+import tempfile
+import unittest
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from db import ContentDB  # noqa: E402
+
+
+def article(topic: str, content: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "topic": topic,
+        "content": content,
+        "citations": [],
+        "generated_at": datetime(2024, 1, 1),
+        "metadata": {},
+    }
+
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory(prefix="test-search-")
+        self.addCleanup(scratch.cleanup)
+        self.db = ContentDB(str(Path(scratch.name) / "content.db"))
+        self.addCleanup(self.db.close)
+
+    def test_finds_by_stem_and_ranks_topic_matches_first(self):
+        body_match = article("Gardening", "Notes on rust resistant batteries for sheds.")
+        topic_match = article("Battery chemistry", "Lithium cells and how they age.")
+        self.db.save_many("s1", [body_match, article("Cooking", "Slow roasted tomatoes."), topic_match])
+
+        results, total = self.db.search("battery")
+        self.assertEqual(total, 2)
+        self.assertEqual([r["id"] for r in results], [topic_match["id"], body_match["id"]])
+        self.assertGreater(results[0]["score"], results[1]["score"])
+        self.assertIn("<mark>batteries</mark>", results[1]["snippet"])
+
+    def test_snippet_escapes_article_html(self):
+        self.db.save_content("s1", article(
+            "Web security",
+            'Never echo <script>alert("x")</script> back, and note that 1 < 2 & 3 > 2 in every browser.',
+        ))
+
+        [result], total = self.db.search("browser")
+        snippet = result["snippet"]
+        self.assertEqual(total, 1)
+        self.assertIn("&lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt;", snippet)
+        self.assertIn("1 &lt; 2 &amp; 3 &gt; 2", snippet)
+        self.assertIn("<mark>browser.</mark>", snippet)
+        self.assertEqual(snippet.replace("<mark>", "").replace("</mark>", "").count("<"), 0)
+
+    def test_empty_and_operator_only_queries_match_nothing(self):
+        self.db.save_content("s1", article("Anything", "Some text."))
+        self.assertEqual(self.db.search(""), ([], 0))
+        self.assertEqual(self.db.search('" * ( )'), ([], 0))
+
+    def test_ensure_search_index_backfills_once(self):
+        items = [article(f"Topic {i}", f"Body about comets number {i}.") for i in range(5)]
+        self.db.save_many("s1", items)
+        with self.db.connect() as conn:
+            conn.execute("INSERT INTO content_fts(content_fts) VALUES ('delete-all')")
+        self.assertEqual(self.db.search("comets"), ([], 0))
+
+        self.assertEqual(self.db.ensure_search_index(), 5)
+        self.assertEqual(self.db.search("comets")[1], 5)
+        self.assertEqual(self.db.ensure_search_index(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import hashlib
+import logging
+import time
+from typing import Any, Dict, List, Optional, Type
+
+from crewai.tools import BaseTool
+from pydantic import BaseModel, Field, PrivateAttr
+
+from cache import TTLCache, normalize_topic
+from cancellation import checkpoint
+from metrics import SEARCH_REQUESTS_TOTAL, SEARCH_SECONDS
+from resilience import Dependency
+
+logger = logging.getLogger(__name__)
+
+
+class SearchQuery(BaseModel):
+    search_query: str = Field(..., description="Mandatory search query you want to use to search the internet")
+
+
+class CachedSearchTool(BaseTool):
+    """Memoizing wrapper around a web search tool (normally SerperDevTool).
+
+    Presents the same name and arguments as Serper so it can replace it on the
+    researcher transparently. Results are kept in a shared TTLCache keyed on
+    the folded query, so repeated searches across crew runs cost nothing.
+    Backend calls go through `guard` (retries, hedging, circuit breaker) when given.
+    """
+
+    name: str = "Search the internet with Serper"
+    description: str = (
+        "A tool that can be used to search the internet with a search_query. "
+        "Returns organic results, news and related questions."
+    )
+    args_schema: Type[BaseModel] = SearchQuery
+    backend: Any = Field(..., exclude=True)
+    _cache: TTLCache = PrivateAttr()
+    _guard: Optional[Dependency] = PrivateAttr(default=None)
+
+    def __init__(self, backend: BaseTool, cache: TTLCache, guard: Optional[Dependency] = None, **kwargs):
+        super().__init__(backend=backend, **kwargs)
+        self._cache = cache
+        self._guard = guard
+
+    def _run(self, search_query: str, **kwargs) -> Any:
+        key = _query_key(search_query, kwargs)
+        cached = self._cache.get(key)
+        if cached is not None:
+            logger.info(f"Search cache hit: {search_query!r}")
+            SEARCH_REQUESTS_TOTAL.inc(source="cache")
+            return cached
+        # Don't spend search quota on a generation nobody is waiting for
+        checkpoint()
+        SEARCH_REQUESTS_TOTAL.inc(source="backend")
+        start = time.perf_counter()
+        try:
+            if self._guard:
+                result = self._guard.call(lambda: self.backend.run(search_query=search_query, **kwargs))
+            else:
+                result = self.backend.run(search_query=search_query, **kwargs)
+        except Exception:
+            SEARCH_SECONDS.observe(time.perf_counter() - start, status="error")
+            raise
+        SEARCH_SECONDS.observe(time.perf_counter() - start, status="ok")
+        self._cache.set(key, result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+
+class StubSearchTool(BaseTool):
+    """Offline stand-in for SerperDevTool returning deterministic fake results.
+
+    The results depend only on the query, and `latency` seconds are slept per
+    call to mimic the network. `calls` counts backend invocations.
+    """
+
+    name: str = "Search the internet with Serper"
+    description: str = "Offline search stub that returns deterministic results for a search_query."
+    args_schema: Type[BaseModel] = SearchQuery
+    latency: float = 0.0
+    results_per_query: int = 5
+    calls: int = 0
+
+    def _run(self, search_query: str, **kwargs) -> Dict[str, Any]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        digest = hashlib.sha1(search_query.encode()).hexdigest()[:8]
+        organic: List[Dict[str, Any]] = [
+            {
+                "title": f"{search_query.title()} - report {n}",
+                "link": f"https://example.com/{digest}/{n}",
+                "snippet": f"Key facts and statistics about {search_query} (source {n}).",
+                "position": n,
+            }
+            for n in range(1, self.results_per_query + 1)
+        ]
+        return {"searchParameters": {"q": search_query}, "organic": organic}
+
+
+def _query_key(search_query: str, options: Dict[str, Any]) -> str:
+    return normalize_topic(search_query) + "\x1f" + json.dumps(options, sort_keys=True, default=str)